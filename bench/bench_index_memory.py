@@ -0,0 +1,74 @@
+"""Память и скорость индекса dic на большом синтетическом словаре.
+
+    python bench/bench_index_memory.py [--rules N] [--seed S]
+
+Память замеряется tracemalloc: индекс после добавления всех правил (списки номеров) и после freeze
+(упакованные массивы). Для сравнения приводится AutomatonIndexer."""
+import argparse
+import gc
+import random
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dicrector.components import PatternWildcard
+from dicrector.indexer import Indexer, AutomatonIndexer
+
+ALPHABET = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+
+
+def synthetic_rules(count: int, rng: random.Random) -> list[str]:
+    """Шаблоны поиска: в основном слова целиком, часть с масками, как в реальных словарях"""
+    rules = []
+    for _ in range(count):
+        word = ''.join(rng.choices(ALPHABET, k=rng.randint(3, 14)))
+        mask = rng.random()
+        if mask < 0.15:
+            word += '*'
+        elif mask < 0.25:
+            word = '*' + word
+        elif mask < 0.28:
+            word = f'*{word[:4]}*'
+        rules.append(word)
+    return rules
+
+
+def build_traced(indexer_class, patterns) -> tuple:
+    """Индекс и занятая им память до и после freeze. Замер в одном сеансе tracemalloc, иначе освобождение
+    памяти, выделенной до начала замера, не учитывается"""
+    gc.collect()
+    tracemalloc.start()
+    index = indexer_class()
+    for i, pattern in enumerate(patterns):
+        index.add(pattern, i)
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    index.freeze()
+    gc.collect()
+    frozen_size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return index, size, frozen_size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rules', type=int, default=500_000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    patterns = [PatternWildcard.from_str(rule) for rule in synthetic_rules(args.rules, rng)]
+    words = [''.join(rng.choices(ALPHABET, k=rng.randint(2, 14))) for _ in range(20_000)]
+    print(f'правил {len(patterns)}')
+
+    for indexer_class in (Indexer, AutomatonIndexer):
+        index, size, frozen_size = build_traced(indexer_class, patterns)
+        seconds = min(timeit.repeat(lambda: [index[word] for word in words], number=1, repeat=3))
+        print(f'{indexer_class.__name__:16} до freeze {size / 2**20:7.1f} МБ, после {frozen_size / 2**20:7.1f} МБ, '
+              f'{len(words) / seconds / 1000:.0f} тыс. слов/с')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Словарь rexw: проверка правил в каждом слове против одного прохода каждого правила по соединенному тексту слов
+(DictionaryRe, joined_scan) на синтетических данных (см. synthetic.py).
+
+    python bench/bench_rexw.py [--rules 20,100,500,2000] [--classes F] [--lines N] [--repeat N]
+
+Замеряется только применение словаря к словам, без разбора строк. Кроме правил synthetic.rexw_rules, доля
+classes правил — наборы символов без обязательной подстроки, которые проверяются в каждом слове.
+При расхождении результатов код завершения 1."""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import synthetic
+from dicrector import Corrector
+from dicrector.textparse import Line
+
+
+def class_rules(rng: random.Random, count: int) -> list[str]:
+    rules = []
+    for _ in range(count):
+        first = ''.join(rng.sample(synthetic.CONSONANTS, 2))
+        second = ''.join(rng.sample(synthetic.VOWELS, 2))
+        rules.append(f'^([{first}][{second}]\\w*[{first}])$=$1`')
+    return rules
+
+
+def apply_seconds(dictionary, lines: list[str], repeat: int) -> tuple[float, list[str]]:
+    """Лучшее время применения словаря к словам строк и результат"""
+    best = float('inf')
+    for _ in range(repeat):
+        parsed = [Line.from_str(line) for line in lines]
+        words = [word for line in parsed for sentence in line.childs for word in sentence.childs]
+        start = time.perf_counter()
+        dictionary.apply_batch(words)
+        best = min(best, time.perf_counter() - start)
+    return best, [line.text for line in parsed]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rules', default='20,100,500,2000', help='размеры словаря через запятую')
+    parser.add_argument('--classes', type=float, default=0.1, help='доля правил без обязательной подстроки')
+    parser.add_argument('--lines', type=int, default=2000, help='строк корпуса')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    words = synthetic.vocabulary(rng, 20_000)
+    lines = synthetic.Corpus(rng, words).lines(args.lines)
+    count = sum(len(sentence.childs) for line in lines for sentence in Line.from_str(line).childs)
+    print(f'корпус: {len(lines)} строк, {count} слов')
+    mismatches = 0
+    with tempfile.TemporaryDirectory() as temp:
+        for size in map(int, args.rules.split(',')):
+            classes = int(size * args.classes)
+            path = Path(temp) / f'bench{size}.rexw'
+            rules = synthetic.rexw_rules(rng, words, size - classes) + class_rules(rng, classes)
+            path.write_text('\n'.join(rules) + '\n', encoding='utf-8')
+            results = {}
+            for joined_scan in (False, True):
+                dictionary = Corrector([(path, {'joined_scan': joined_scan})]).dictionaries[0][0]
+                apply_seconds(dictionary, lines[:50], 1)  # компиляция выражений при первом применении
+                results[joined_scan] = apply_seconds(dictionary, lines, args.repeat)
+            (per_word, expected), (joined, result) = results[False], results[True]
+            if result != expected:
+                mismatches += 1
+                print(f'правил {size}: результаты отличаются')
+            print(f'правил {size:5}: по словам {count / per_word / 1e3:6.0f} тыс. слов/с, '
+                  f'проходом по тексту {count / joined / 1e3:6.0f} тыс. слов/с, x{per_word / joined:.2f}')
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Сервер dicrector.serve против обработки в процессе: задержка одиночного запроса, пропускная способность
+и память процессов на синтетических данных (см. synthetic.py).
+
+    python bench/bench_serve.py [--rules N] [--lines N] [--workers N] [--clients N]
+
+Задержка — медиана и 99-й процентиль execute одной строки. Пропускная способность — строк в секунду: в процессе
+execute_batch, через сервер — execute_many с отправкой запросов без ожидания ответов, одним и несколькими
+клиентами одновременно. Память (Linux) — пропорциональная доля (PSS) процессов-обработчиков, в которой общие
+страницы делятся между процессами, и их полный размер (RSS)."""
+import argparse
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import synthetic
+from dicrector import Corrector
+from dicrector import compiled
+from dicrector.serve import CorrectorClient
+
+CHAIN = ('rex', 'dicx', 'dic', 'rexw')
+
+
+def latencies(execute, lines: list[str]) -> tuple[float, float]:
+    """Медиана и 99-й процентиль, мс"""
+    times = []
+    for line in lines:
+        start = time.perf_counter()
+        execute(line)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return statistics.median(times) * 1000, times[int(len(times) * 0.99)] * 1000
+
+
+def memory_mb(pid: int) -> tuple[float, float] | None:
+    """PSS и RSS процесса, МБ"""
+    try:
+        text = Path(f'/proc/{pid}/smaps_rollup').read_text()
+    except OSError:
+        return None
+    fields = dict(line.split(':', 1) for line in text.splitlines()[1:])
+    return int(fields['Pss'].split()[0]) / 1024, int(fields['Rss'].split()[0]) / 1024
+
+
+def children(pid: int) -> list[int]:
+    try:
+        return [int(p) for p in Path(f'/proc/{pid}/task/{pid}/children').read_text().split()]
+    except OSError:
+        return []
+
+
+def start_server(names: list[Path], address: Path, workers: int) -> subprocess.Popen:
+    server = subprocess.Popen([sys.executable, '-m', 'dicrector.serve', '--dicts', *map(str, names),
+                               '--socket', str(address), '--workers', str(workers)], cwd=ROOT)
+    while True:
+        if server.poll() is not None:
+            sys.exit('сервер не запустился')
+        try:
+            CorrectorClient(address).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rules', type=int, default=100_000, help='правил dic, остальные форматы пропорционально')
+    parser.add_argument('--lines', type=int, default=2000, help='строк корпуса')
+    parser.add_argument('--workers', type=int, default=2, help='процессов-обработчиков сервера')
+    parser.add_argument('--clients', type=int, default=2, help='одновременных клиентов')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp:
+        directory = Path(temp)
+        rng = random.Random(args.seed)
+        words = synthetic.vocabulary(rng, 20_000)
+        corpus = synthetic.Corpus(rng, words)
+        lines = corpus.lines(args.lines)
+        paths = synthetic.write(directory, rng, words, corpus, args.rules, 0.2)
+        names = [paths[format_] for format_ in CHAIN]
+        compiled.CACHE_DIR_NAME = None
+
+        corrector = Corrector(names)
+        expected = corrector.execute_batch(lines)
+        median, p99 = latencies(corrector.execute, lines[:500])
+        start = time.perf_counter()
+        corrector.execute_batch(lines)
+        print(f'в процессе:       задержка {median:.3f} / {p99:.3f} мс, '
+              f'{len(lines) / (time.perf_counter() - start):.0f} строк/с')
+        del corrector
+
+        address = directory / 'dicrector.sock'
+        server = start_server(names, address, args.workers)
+        try:
+            with CorrectorClient(address) as client:
+                median, p99 = latencies(client.execute, lines[:500])
+                start = time.perf_counter()
+                results = client.execute_many(lines)
+                seconds = time.perf_counter() - start
+            assert results == expected, 'результаты сервера отличаются'
+            print(f'сервер, 1 клиент: задержка {median:.3f} / {p99:.3f} мс, {len(lines) / seconds:.0f} строк/с')
+
+            def run_client(_):
+                with CorrectorClient(address) as client_:
+                    return client_.execute_many(lines)
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(args.clients) as pool:
+                list(pool.map(run_client, range(args.clients)))
+            seconds = time.perf_counter() - start
+            print(f'сервер, клиентов {args.clients}: {args.clients * len(lines) / seconds:.0f} строк/с')
+
+            memory = [memory_mb(pid) for pid in children(server.pid)]
+            if all(memory) and memory:
+                pss = sum(m[0] for m in memory)
+                rss = sum(m[1] for m in memory)
+                print(f'память обработчиков ({len(memory)}): PSS {pss:.0f} МБ, RSS {rss:.0f} МБ')
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Словари dic в общей памяти (dicrector.shared) против собственной копии в каждом процессе пула: память
+процессов-обработчиков и скорость обработки на синтетических данных (см. synthetic.py).
+
+    python bench/bench_shared.py [--rules N] [--wildcards F] [--lines N] [--workers N]
+
+Память (Linux) — пропорциональная доля (PSS) процессов-обработчиков, в которой общие страницы делятся между
+процессами, и их полный размер (RSS), после обработки корпуса. Процессы запускаются методом spawn, поэтому их
+память — только загруженное ими самими, без унаследованной от текущего процесса. Скорость — execute_batch
+в текущем процессе."""
+import argparse
+import multiprocessing
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import synthetic
+from bench_serve import memory_mb
+from dicrector import Corrector
+from dicrector import compiled, textparse
+from dicrector.process import Formats, _init_worker, _execute_chunk
+
+
+def speed(corrector: Corrector, lines: list[str], repeat: int=3) -> float:
+    """Строк в секунду, лучший из repeat замеров"""
+    best = min(_seconds(corrector, lines) for _ in range(repeat))
+    return len(lines) / best
+
+
+def _seconds(corrector: Corrector, lines: list[str]) -> float:
+    start = time.perf_counter()
+    corrector.execute_batch(lines)
+    return time.perf_counter() - start
+
+
+def pool_memory(corrector: Corrector, lines: list[str], workers: int) -> tuple[float, float]:
+    """PSS и RSS процессов пула, МБ, после обработки строк"""
+    with ProcessPoolExecutor(workers, multiprocessing.get_context('spawn'), initializer=_init_worker,
+                             initargs=(corrector.dictionary_names, dict(Formats.paths), corrector.word_cache,
+                                       textparse.tokenizer, corrector.shared_segments())) as pool:
+        chunks = [lines[i::workers] for i in range(workers)]
+        list(pool.map(_execute_chunk, chunks))
+        memory = [m for pid in pool._processes if (m := memory_mb(pid))]  # без resource_tracker
+    return sum(m[0] for m in memory), sum(m[1] for m in memory)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rules', type=int, default=200_000, help='правил dic')
+    parser.add_argument('--wildcards', type=float, default=0.2, help='доля правил с маской')
+    parser.add_argument('--lines', type=int, default=2000, help='строк корпуса')
+    parser.add_argument('--workers', type=int, default=4, help='процессов пула')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp:
+        directory = Path(temp)
+        rng = random.Random(args.seed)
+        words = synthetic.vocabulary(rng, 20_000)
+        corpus = synthetic.Corpus(rng, words)
+        lines = corpus.lines(args.lines)
+        paths = synthetic.write(directory, rng, words, corpus, args.rules, args.wildcards)
+        compiled.CACHE_DIR_NAME = None
+
+        corrector = Corrector([paths['dic']])
+        expected = corrector.execute_batch(lines)
+        print(f'dic, правил {args.rules}, с маской {args.wildcards:.0%}')
+        print(f'в процессе:        {speed(corrector, lines):.0f} строк/с')
+        pss, rss = pool_memory(corrector, lines, args.workers)
+        print(f'пул, свои копии:   PSS {pss:.0f} МБ, RSS {rss:.0f} МБ, процессов {args.workers}')
+
+        with corrector.share() as shared:
+            size = sum(path.stat().st_size for path in shared.segments.values()) / 2 ** 20
+            assert corrector.execute_batch(lines) == expected, 'результаты словаря в общей памяти отличаются'
+            print(f'в общей памяти:    {speed(corrector, lines):.0f} строк/с, файл {size:.1f} МБ')
+            pss, rss = pool_memory(corrector, lines, args.workers)
+            print(f'пул, общая память: PSS {pss:.0f} МБ, RSS {rss:.0f} МБ, процессов {args.workers}')
+
+
+if __name__ == '__main__':
+    main()
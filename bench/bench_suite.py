@@ -0,0 +1,198 @@
+"""Замеры форматов, индекса и цепочек словарей на синтетических данных (см. synthetic.py).
+
+    python bench/bench_suite.py [--rules N] [--lines N] [--wildcards 0.2] [--output result.json]
+                                [--compare baseline.json]
+
+Для каждого формата: загрузка без кеша и из кеша откомпилированных словарей, построение индекса, пиковая память
+при загрузке, слов в секунду. Для смешанной цепочки — то же, без кеша слов и с ним. Для индекса dic — выигрыш
+перед последовательной проверкой всех правил и влияние длины ключа Indexer.
+Результат — json, который можно сравнить с результатом другой версии параметром --compare: выводятся метрики,
+ухудшившиеся больше чем на --threshold, код завершения 1."""
+import argparse
+import gc
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import synthetic
+from dicrector import Corrector
+from dicrector import compiled
+from dicrector.components import Dictionary, DictionaryIndex, DictionaryRe
+from dicrector.indexer import Indexer
+from dicrector.textparse import Line
+
+FORMATS = ('dic', 'dicx', 'rex', 'rexw', 'extw')
+CHAIN = ('rex', 'dicx', 'dic', 'rexw', 'extw')  # строка, предложение, слово — рекомендуемый порядок
+KEY_LENGTHS = range(4, 11)
+# метрики, для которых больше — лучше, у остальных (время, память, кандидаты) лучше меньше
+HIGHER_IS_BETTER = ('words_per_second', 'lookups_per_second', 'speedup')
+
+
+def best_of(repeat: int, func) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def load_seconds(names: list, cached: bool, repeat: int) -> float:
+    """Время создания Corrector. Для cached кеш предварительно заполняется"""
+    compiled.CACHE_DIR_NAME = '__dicache__' if cached else None
+    if cached:
+        Corrector(names)
+    gc.collect()
+    return best_of(repeat, lambda: Corrector(names))
+
+
+def peak_memory(names: list) -> float:
+    """Пиковая память загрузки, МБ"""
+    compiled.CACHE_DIR_NAME = None
+    gc.collect()
+    tracemalloc.start()
+    corrector = Corrector(names)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del corrector
+    return peak / 2**20
+
+
+def index_seconds(dictionary) -> float | None:
+    """Время построения индекса по загруженным правилам"""
+    if not isinstance(dictionary, (DictionaryIndex, DictionaryRe)):
+        return None
+    return best_of(1, lambda: type(dictionary).make_index(dictionary.rules))
+
+
+def words_per_second(corrector: Corrector, lines: list[str], words: int, repeat: int) -> float:
+    return words / best_of(repeat, lambda: [corrector.execute(line) for line in lines])
+
+
+def measure(names: list, lines: list[str], words: int, repeat: int, word_cache: int=0) -> dict:
+    result = {
+        'load_seconds': load_seconds(names, False, repeat),
+        'load_cached_seconds': load_seconds(names, True, repeat),
+        'peak_memory_mb': peak_memory(names),
+    }
+    corrector = Corrector(names, word_cache=word_cache)
+    if len(names) == 1:
+        result['index_seconds'] = index_seconds(corrector.dictionaries[0][0])
+    result['words_per_second'] = words_per_second(corrector, lines, words, repeat)
+    return {key: value for key, value in result.items() if value is not None}
+
+
+def measure_index(dic_path: Path, tokens: list[str], repeat: int) -> dict:
+    """Выигрыш индекса dic перед последовательной проверкой правил и замеры Indexer с разной длиной ключа"""
+    compiled.CACHE_DIR_NAME = None
+    indexed, _ = Corrector._load(dic_path)
+    linear = Dictionary(indexed.rules)
+    sample = tokens[:max(len(tokens) // 50, 20)]  # последовательная проверка медленная
+    linear_time = best_of(1, lambda: [list(linear.rules_for(Line.from_str(t))) for t in sample])
+    indexed_time = best_of(repeat, lambda: [list(indexed.rules_for(Line.from_str(t))) for t in sample])
+    result = {'dic_index': {'speedup': linear_time / indexed_time, 'rules': len(indexed.rules)}}
+
+    patterns = [rule.pattern for rule in indexed.rules]
+    for key_length in KEY_LENGTHS:
+        index = Indexer(key_length)
+        for i, pattern in enumerate(patterns):
+            index.add(pattern, i)
+        index.freeze()
+        seconds = best_of(repeat, lambda: [index[token] for token in tokens])
+        candidates = sum(len(index[token]) for token in tokens)
+        result[f'indexer_key_length_{key_length}'] = {
+            'lookups_per_second': len(tokens) / seconds,
+            'candidates_per_word': candidates / len(tokens),
+        }
+    return result
+
+
+def metadata(args) -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {'rules': args.rules, 'lines': args.lines, 'wildcards': args.wildcards, 'seed': args.seed},
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> int:
+    """Вывод сравнения с baseline, возвращается число ухудшившихся метрик"""
+    if baseline['meta']['parameters'] != current['meta']['parameters']:
+        print('ВНИМАНИЕ: параметры замеров различаются')
+    regressions = 0
+    for case, metrics in current['results'].items():
+        for metric, value in metrics.items():
+            old = baseline['results'].get(case, {}).get(metric)
+            if not old or not isinstance(value, float):
+                continue
+            ratio = value / old
+            worse = ratio < 1 - threshold if metric in HIGHER_IS_BETTER else ratio > 1 + threshold
+            regressions += worse
+            print(f'{case:28} {metric:22} {old:12.4g} {value:12.4g} {ratio:6.2f}{"  ухудшение" if worse else ""}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rules', type=int, default=100_000, help='правил dic, остальные форматы пропорционально')
+    parser.add_argument('--lines', type=int, default=2000, help='строк корпуса')
+    parser.add_argument('--vocabulary', type=int, default=20_000, help='различных слов корпуса')
+    parser.add_argument('--wildcards', type=float, default=0.2, help='доля правил с маской в dic и dicx')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--formats', default=','.join(FORMATS))
+    parser.add_argument('--workdir', type=Path, help='папка для данных, по умолчанию временная')
+    parser.add_argument('--output', type=Path, help='файл результата json')
+    parser.add_argument('--compare', type=Path, help='результат другой версии для сравнения')
+    parser.add_argument('--threshold', type=float, default=0.1, help='допустимое ухудшение, доля')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp:
+        directory = args.workdir or Path(temp)
+        rng = random.Random(args.seed)
+        words = synthetic.vocabulary(rng, args.vocabulary)
+        corpus = synthetic.Corpus(rng, words)
+        lines = corpus.lines(args.lines)
+        paths = synthetic.write(directory, rng, words, corpus, args.rules, args.wildcards)
+        tokens = [token.text for line in lines for sentence in Line.from_str(line).childs
+                  for token in sentence.childs]
+        print(f'корпус: {len(lines)} строк, {len(tokens)} токенов; правил dic: {args.rules}', file=sys.stderr)
+
+        results = {}
+        for format_ in args.formats.split(','):
+            results[format_] = measure([paths[format_]], lines, len(tokens), args.repeat)
+            print(format_, results[format_], file=sys.stderr)
+        chain = [paths[format_] for format_ in CHAIN]
+        results['chain'] = measure(chain, lines, len(tokens), args.repeat)
+        results['chain_word_cache'] = measure(chain, lines, len(tokens), args.repeat, word_cache=100_000)
+        results.update(measure_index(paths['dic'], tokens, args.repeat))
+
+    report = {'meta': metadata(args), 'results': results}
+    text = json.dumps(report, ensure_ascii=False, indent=1)
+    if args.output:
+        args.output.write_text(text, encoding='utf-8')
+    else:
+        print(text)
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding='utf-8'))
+        if compare(baseline, report, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Сравнение бэкендов разбора текста: совпадение результатов с razdel и скорость.
+
+    python bench/bench_tokenizers.py [корпус] [--repeat N]
+
+Корпус — текстовый файл, строка на абзац. По умолчанию tokenize_corpus.txt рядом со скриптом.
+При расхождении результатов выводятся отличающиеся строки, код завершения 1."""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dicrector.tokenizers import RazdelTokenizer, RegexTokenizer
+
+
+def spans(substrings) -> list[tuple]:
+    return [(s.start, s.stop, s.text) for s in substrings]
+
+
+def compare(lines: list[str], reference, tokenizer) -> int:
+    mismatches = 0
+    for line in lines:
+        for method in ('sentenize', 'tokenize'):
+            expected = spans(getattr(reference, method)(line))
+            result = spans(getattr(tokenizer, method)(line))
+            if result != expected:
+                mismatches += 1
+                print(f'{type(tokenizer).__name__}.{method}: {line!r}\n  ожидалось {expected}\n  получено  {result}')
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('corpus', nargs='?', type=Path, default=Path(__file__).parent / 'tokenize_corpus.txt')
+    parser.add_argument('--repeat', type=int, default=20, help='проходов по корпусу при замере')
+    args = parser.parse_args()
+    lines = args.corpus.read_text(encoding='utf-8').splitlines()
+
+    reference = RazdelTokenizer()
+    backends = [reference, RegexTokenizer()]
+    if sum(compare(lines, reference, tokenizer) for tokenizer in backends[1:]):
+        sys.exit(1)
+    print(f'результаты совпадают: {len(lines)} строк, {sum(map(len, lines))} символов')
+
+    for tokenizer in backends:
+        seconds = min(timeit.repeat(lambda: [list(tokenizer.tokenize(line)) for line in lines],
+                                    number=args.repeat, repeat=3))
+        chars_per_second = sum(map(len, lines)) * args.repeat / seconds
+        print(f'{type(tokenizer).__name__:16} tokenize {seconds:.3f} с, {chars_per_second / 1e6:.2f} млн символов/с')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Проверка общего индекса словарей dic (merge_index, см. MergedIndex): результат цепочки с общим индексом, с кешем
+слов и без него, совпадает с последовательным применением словарей.
+
+    python bench/check_merge_index.py [--rules N] [--lines N] [--seed N]
+
+Сначала проверяются известные случаи — цепочки из нескольких общих индексов, затем цепочка синтетических словарей
+(см. synthetic.py). При расхождении выводятся отличающиеся строки, код завершения 1."""
+import argparse
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import synthetic
+from dicrector import Corrector
+from dicrector import compiled
+
+# (правила словарей dic, параметры словарей, строки): два общих индекса подряд — смена fold_yo между ними
+KNOWN = [
+    (['кот*=КОТ', 'мыш*=МЫШ', 'zzz*=Z', 'кот*=ПЁС'],
+     [{}, {}, {'fold_yo': True}, {'fold_yo': True}],
+     ['котик мышка', 'кот мыш zzz']),
+]
+
+
+def mismatches(names: list, lines: list[str]) -> list[str]:
+    """Отличия цепочки names с общим индексом (без кеша слов и с ним) от последовательного применения"""
+    def chain(merge_index: bool) -> list:
+        return [(path, {**options, 'merge_index': merge_index} if path.suffix == '.dic' else options)
+                for path, options in names]
+
+    sequential = Corrector(chain(False))
+    expected = [sequential.execute(line) for line in lines]
+    result = []
+    for word_cache in (0, 100):
+        merged = Corrector(chain(True), word_cache=word_cache)
+        for line, text in zip(lines, expected):
+            got = merged.execute(line)
+            if got != text:
+                result.append(f'word_cache={word_cache} {line!r}\n  ожидалось {text!r}\n  получено  {got!r}')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rules', type=int, default=2000, help='правил словаря dic')
+    parser.add_argument('--lines', type=int, default=500, help='строк корпуса')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    compiled.CACHE_DIR_NAME = None
+
+    failures = []
+    with tempfile.TemporaryDirectory() as temp:
+        temp = Path(temp)
+        for n, (rules, options, lines) in enumerate(KNOWN):
+            names = []
+            for k, (rule, option) in enumerate(zip(rules, options)):
+                path = temp / f'known{n}_{k}.dic'
+                path.write_text(rule + '\n', encoding='utf-8')
+                names.append((path, option))
+            failures += mismatches(names, lines)
+
+        rng = random.Random(args.seed)
+        words = synthetic.vocabulary(rng, 20_000)
+        corpus = synthetic.Corpus(rng, words)
+        paths = synthetic.write(temp / 'synthetic', rng, words, corpus, args.rules, 0.2)
+        dic = synthetic.dic_rules(rng, words, args.rules, 0.2)
+        parts = [temp / f'part{k}.dic' for k in range(3)]
+        for k, path in enumerate(parts):
+            path.write_text('\n'.join(dic[k::len(parts)]) + '\n', encoding='utf-8')
+        lines = corpus.lines(args.lines)
+        # общий индекс делится на два в одном WordChain: rexw без пакетной обработки (при кеше слов), смена fold_yo
+        failures += mismatches([(parts[0], {}), (parts[1], {}), (paths['rexw'], {'joined_scan': False}),
+                                (parts[2], {}), (paths['dic'], {})], lines)
+        failures += mismatches([(parts[0], {}), (parts[1], {}), (parts[2], {'fold_yo': True}),
+                                (paths['dic'], {'fold_yo': True})], lines)
+
+    for failure in failures[:10]:
+        print(failure)
+    print(f'расхождений: {len(failures)}')
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Проверка частичного разбора (Node._reparse): после изменения текста строки или предложения дочки совпадают
+с полным разбором нового текста.
+
+    python bench/check_reparse.py [корпус] [--edits N] [--seed N]
+
+Сначала проверяются известные случаи неустойчивого разбора, затем случайные правки строк корпуса (по умолчанию
+tokenize_corpus.txt рядом со скриптом) и строк из коротких предложений. При расхождении выводятся отличающиеся
+разборы, код завершения 1."""
+import argparse
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dicrector.textparse import Line, Sentence
+
+# (исходный текст, измененный текст)
+KNOWN = [
+    # razdel объединяет "Слово." с "— !" по строчной букве в 10 символах справа, за двумя короткими предложениями
+    ('Да. Слово. — ! « ! Б да', 'Да. Слово. — ! « ! а да'),
+    ('Да. Слово. — ! " ? Б да', 'Да. Слово. — ! " ? а да'),
+]
+FRAGMENTS = [' ', '. ', ', ', '!', '?', '...', '—', '-', '«', '»', '"', '(', ')', 'т. е.', 'т.', 'г.', 'А. ', 'Т. ',
+             '1/2', '2', 'а', 'Б', 'слово', 'Слово', 'x']
+SHORT = ['Да.', 'Ну.', 'Б.', '!', '?', '—', '-', '...', 'т.', 'е.', '1.', '2)', 'а', 'Б', '«', '»', '"']
+
+
+def line_spans(line: Line) -> list[tuple]:
+    return [(s._start, s.text, sentence_spans(s)) for s in line.childs]
+
+
+def sentence_spans(sentence: Sentence) -> list[tuple]:
+    return [(t._start, t.text) for t in sentence.childs]
+
+
+def check(node, text: str, spans, fresh) -> str | None:
+    """Изменение текста node на text. Описание расхождения с полным разбором или None"""
+    spans(node)  # дочки разобраны до изменения
+    before = node.text
+    node.text = text
+    result, expected = spans(node), spans(fresh(text))
+    if result == expected:
+        return None
+    return f'{before!r} -> {text!r}\n  ожидалось {expected}\n  получено  {result}'
+
+
+def edited(rng: random.Random, text: str, fragments: list[str]) -> str:
+    for _ in range(rng.randint(1, 3)):
+        start = rng.randrange(len(text) + 1)
+        stop = min(len(text), start + rng.randint(0, 5))
+        text = text[:start] + ''.join(rng.choice(fragments) for _ in range(rng.randint(0, 2))) + text[stop:]
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('corpus', nargs='?', type=Path, default=Path(__file__).parent / 'tokenize_corpus.txt')
+    parser.add_argument('--edits', type=int, default=2000, help='случайных правок каждого вида')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    lines = [line for line in args.corpus.read_text(encoding='utf-8').splitlines() if line.strip()]
+    rng = random.Random(args.seed)
+
+    failures = [check(Line.from_str(old), new, line_spans, Line.from_str) for old, new in KNOWN]
+    for _ in range(args.edits):
+        line = Line.from_str(rng.choice(lines))
+        failures.append(check(line, edited(rng, line.text, FRAGMENTS), line_spans, Line.from_str))
+        sentence = rng.choice(line.childs)
+        failures.append(check(sentence, edited(rng, sentence.text, FRAGMENTS), sentence_spans, Sentence))
+        short = ' '.join(rng.choice(SHORT) for _ in range(rng.randint(4, 14)))
+        failures.append(check(Line.from_str(short), edited(rng, short, SHORT), line_spans, Line.from_str))
+    failures = [failure for failure in failures if failure]
+    for failure in failures[:10]:
+        print(failure)
+    print(f'правок: {len(KNOWN) + 3 * args.edits}, расхождений: {len(failures)}')
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
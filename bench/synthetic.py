@@ -0,0 +1,157 @@
+"""Синтетические данные для замеров: русскоподобные слова, корпус текста и словари всех форматов.
+Результат определяется зерном генератора случайных чисел, поэтому замеры воспроизводимы."""
+import random
+from itertools import accumulate
+from pathlib import Path
+
+CONSONANTS = 'бвгджзклмнпрстфхцчшщ'
+VOWELS = 'аеиоуыэюяё'
+ENDINGS = ('', 'а', 'ы', 'у', 'ом', 'ой', 'ами', 'ов', 'ет', 'ит', 'ут', 'ая', 'ое', 'ие', 'ого')
+ROMAN = ('II', 'III', 'IV', 'XIV', 'XIX', 'XX', 'XXI')
+
+
+def stem(rng: random.Random) -> str:
+    syllables = rng.choices((1, 2, 3, 4), weights=(2, 4, 3, 1))[0]
+    text = ''.join(rng.choice(CONSONANTS) + rng.choice(VOWELS) for _ in range(syllables))
+    if rng.random() < 0.5:
+        text += rng.choice(CONSONANTS)
+    return text
+
+
+def vocabulary(rng: random.Random, size: int) -> list[str]:
+    """Словоформы: основы с окончаниями, без повторов"""
+    words = {}
+    while len(words) < size:
+        base = stem(rng)
+        for ending in rng.sample(ENDINGS, rng.randint(1, 4)):
+            words[base + ending] = None
+    return list(words)[:size]
+
+
+def accented(word: str) -> str:
+    """Слово с ударением после первой гласной"""
+    for i, char in enumerate(word):
+        if char in VOWELS:
+            return f'{word[:i + 1]}`{word[i + 1:]}'
+    return word
+
+
+class Corpus:
+    """Текст из слов словаря с частотами по закону Ципфа: короткие частые слова, длинный хвост редких"""
+    def __init__(self, rng: random.Random, words: list[str]):
+        self.rng = rng
+        self.words = words
+        self._cum_weights = list(accumulate(1 / rank for rank in range(1, len(words) + 1)))
+
+    def word(self) -> str:
+        return self.rng.choices(self.words, cum_weights=self._cum_weights)[0]
+
+    def sentence(self) -> str:
+        rng = self.rng
+        tokens = []
+        for _ in range(rng.randint(4, 16)):
+            roll = rng.random()
+            if roll < 0.03:
+                token = f'{self.word()}-{self.word()}'
+            elif roll < 0.05:
+                token = str(rng.randint(1, 2000))
+            elif roll < 0.06:
+                token = f'{rng.randint(1, 9)}/{rng.randint(2, 9)}'
+            elif roll < 0.07:
+                token = rng.choice(ROMAN)
+            else:
+                token = self.word()
+            if rng.random() < 0.1:
+                token += ','
+            tokens.append(token)
+        tokens[0] = tokens[0][0].upper() + tokens[0][1:]
+        return ' '.join(tokens).rstrip(',') + rng.choice('....!?')
+
+    def lines(self, count: int) -> list[str]:
+        return [' '.join(self.sentence() for _ in range(self.rng.randint(1, 4))) for _ in range(count)]
+
+
+def dic_rules(rng: random.Random, words: list[str], count: int, wildcards: float) -> list[str]:
+    """Правила dic. Треть — слова корпуса, остальные — слова, которых в тексте нет. Доля wildcards — правила
+    с маской, поровну слов*, *слов и *слов*"""
+    rules = []
+    for _ in range(count):
+        word = rng.choice(words) if rng.random() < 0.33 else stem(rng) + rng.choice(ENDINGS)
+        roll = rng.random()
+        if roll < wildcards / 3:
+            key = word[:max(3, len(word) - 2)]
+            rules.append(f'{key}*={accented(key)}')
+        elif roll < wildcards * 2 / 3:
+            key = word[-4:]
+            rules.append(f'*{key}={accented(key)}')
+        elif roll < wildcards:
+            key = word[1:5]
+            rules.append(f'*{key}*={key.upper()}')
+        else:
+            rules.append(f'{word}={accented(word)}')
+    return rules
+
+
+def dicx_rules(rng: random.Random, corpus: Corpus, count: int, wildcards: float) -> list[str]:
+    """Правила dicx: словосочетания из двух слов корпуса, часть с маской на краю фразы"""
+    rules = []
+    for _ in range(count):
+        first, second = corpus.word(), corpus.word()
+        if rng.random() < wildcards:
+            second = second[:max(3, len(second) - 2)]
+            rules.append(f'{first} {second}*={first} {accented(second)}')
+        else:
+            rules.append(f'{first} {second}={first} {accented(second)}')
+    return rules
+
+
+def rex_rules(rng: random.Random, words: list[str], count: int) -> list[str]:
+    rules = [r'(\d+)/(\d+)=$1 из $2', r'\s+-\s+= — ', r'\b([IVXLCDM]{2,})\b=$1-й']  # без обязательной подстроки
+    while len(rules) < count:
+        word = rng.choice(words)
+        if rng.random() < 0.5:
+            rules.append(rf'\b{word}\b={accented(word)}')
+        else:
+            rules.append(rf'\b({word[:4]})(\w*)=$1`$2')
+    return rules
+
+
+def rexw_rules(rng: random.Random, words: list[str], count: int) -> list[str]:
+    rules = ['^[IVXLCDM]{2,}$=ROMAN', r'^\d+$=число']
+    while len(rules) < count:
+        word = rng.choice(words)
+        rules.append(f'^{word[:4]}(а|у|ом)?$={accented(word[:4])}$1')
+    return rules
+
+
+EXTW_MODULE = '''# обработчик словаря bench.extw: ударение для слов из набора
+words = set(open(__file__[:-len('_extw.py')] + '.words', encoding='utf-8').read().split())
+
+
+def corrector(node) -> str | None:
+    text = node.text.lower()
+    if text in words:
+        return text + '`'
+    return None
+'''
+
+
+def write(directory: Path, rng: random.Random, words: list[str], corpus: Corpus, rules: int,
+          wildcards: float) -> dict[str, Path]:
+    """Словари всех форматов в directory. Размеры: dic — rules правил, dicx — rules / 10, rex и rexw — rules / 100"""
+    directory.mkdir(parents=True, exist_ok=True)
+    contents = {
+        'dic': dic_rules(rng, words, rules, wildcards),
+        'dicx': dicx_rules(rng, corpus, max(rules // 10, 1), wildcards),
+        'rex': rex_rules(rng, words, max(rules // 100, 4)),
+        'rexw': rexw_rules(rng, words, max(rules // 100, 3)),
+    }
+    paths = {}
+    for format_, lines in contents.items():
+        paths[format_] = directory / f'bench.{format_}'
+        paths[format_].write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    paths['extw'] = directory / 'bench.extw'
+    paths['extw'].touch()
+    (directory / 'bench.words').write_text('\n'.join(rng.sample(words, len(words) // 10)), encoding='utf-8')
+    (directory / 'bench_extw.py').write_text(EXTW_MODULE, encoding='utf-8')
+    return paths
@@ -1 +1,2 @@
 from dicrector.process import Corrector, Formats
+from dicrector.aio import AsyncCorrector
@@ -0,0 +1,142 @@
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+
+from . import textparse
+from .components import _async_local
+from .process import Corrector, Formats, _init_worker, _execute_chunk
+
+ASYNC_BATCH_SIZE = 64  # строк в пакете обработки
+ASYNC_BATCH_DELAY = 0.001  # секунд ожидания запросов для пополнения неполного пакета
+ASYNC_QUEUE_SIZE = 1024  # запросов в очереди, при заполнении correct ожидает освобождения места
+
+
+class AsyncCorrector:
+    """Обработка строк Corrector из asyncio-сервиса без блокировки цикла событий. Одновременные запросы correct
+    собираются в пакеты (до batch_size строк, неполный пакет ждет пополнения batch_delay секунд) и обрабатываются
+    execute_batch в отдельном потоке (workers=1) или пулом из workers процессов, каждый из которых загружает словари
+    при старте. Очередь запросов ограничена queue_size: при ее заполнении correct ожидает, пока обработка не
+    освободит место. Асинхронные обработчики extw и exts выполняются в цикле событий сервиса (см. run_coroutine),
+    в процессах пула — в собственном цикле процесса.
+
+        async with AsyncCorrector(Corrector(['словарь.dic'])) as corrector:
+            result = await corrector.correct(text)
+    """
+    def __init__(self, corrector: Corrector, workers: int=1, batch_size: int=ASYNC_BATCH_SIZE,
+                 batch_delay: float=ASYNC_BATCH_DELAY, queue_size: int=ASYNC_QUEUE_SIZE):
+        self.corrector = corrector
+        self.workers = max(workers, 1)
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.queue_size = queue_size
+        self._queue: asyncio.Queue | None = None
+        self._executor: Executor | None = None
+        self._batcher: asyncio.Task | None = None
+        self._running: set[asyncio.Task] = set()
+        self._slots: asyncio.Semaphore | None = None  # пакетов в обработке не больше, чем исполнителей
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def start(self):
+        """Запуск обработки. Процессы пула загружают словари сразу, а не при первом запросе. Без явного вызова
+        обработка запускается первым correct"""
+        self._open()
+        if self.workers > 1:
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(loop.run_in_executor(self._executor, _execute_chunk, [])
+                                   for _ in range(self.workers)))
+
+    def _open(self):
+        if self._batcher is not None:
+            return
+        loop = asyncio.get_running_loop()
+        if self.workers > 1:
+            corrector = self.corrector
+            self._executor = ProcessPoolExecutor(
+                self.workers, initializer=_init_worker,
+                initargs=(corrector.dictionary_names, dict(Formats.paths), corrector.word_cache,
+                          textparse.tokenizer, corrector.shared_segments()))
+        else:
+            # один поток: кеш слов и статистика Corrector не рассчитаны на одновременную обработку
+            self._executor = ThreadPoolExecutor(1, 'dicrector', initializer=_set_loop, initargs=(loop,))
+        self._queue = asyncio.Queue(self.queue_size)
+        self._slots = asyncio.Semaphore(self.workers)
+        self._batcher = loop.create_task(self._batching())
+
+    async def close(self):
+        """Остановка после обработки принятых пакетов. Запросы, ожидающие в очереди или места в ней, отменяются"""
+        if self._batcher is None:
+            return
+        self._batcher.cancel()
+        await asyncio.gather(self._batcher, *self._running, return_exceptions=True)
+        queue = self._queue
+        while not queue.empty():
+            while not queue.empty():  # каждое освобожденное место пробуждает ожидающий put
+                _, future = queue.get_nowait()
+                future.cancel()
+            await asyncio.sleep(0)  # пробужденные correct помещают запросы в очередь
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._batcher = self._executor = self._queue = None
+
+    async def correct(self, text: str) -> str:
+        self._open()
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queue
+        await queue.put((text, future))
+        if queue is not self._queue:  # очередь остановленной обработки никто не читает
+            future.cancel()
+        return await future
+
+    async def _batching(self):
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        while True:
+            await self._slots.acquire()  # пока все исполнители заняты, запросы копятся в очереди
+            batch = []
+            try:
+                batch.append(await queue.get())
+                self._take(batch)
+                if len(batch) < self.batch_size and self.batch_delay > 0:
+                    await asyncio.sleep(self.batch_delay)
+                    self._take(batch)
+            except asyncio.CancelledError:  # close: набираемый пакет не будет обработан
+                for _, future in batch:
+                    future.cancel()
+                self._slots.release()
+                raise
+            task = loop.create_task(self._execute(batch))  # слот освобождает _execute
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    def _take(self, batch: list):
+        queue = self._queue
+        while len(batch) < self.batch_size and not queue.empty():
+            batch.append(queue.get_nowait())
+
+    async def _execute(self, batch: list[tuple[str, asyncio.Future]]):
+        try:
+            batch = [(text, future) for text, future in batch if not future.done()]  # без отмененных запросов
+            if not batch:
+                return
+            execute = _execute_chunk if self.workers > 1 else self.corrector.execute_batch
+            lines = [text for text, _ in batch]
+            try:
+                results = await asyncio.get_running_loop().run_in_executor(self._executor, execute, lines)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+
+
+def _set_loop(loop: asyncio.AbstractEventLoop):
+    _async_local.loop = loop
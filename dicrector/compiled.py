@@ -0,0 +1,110 @@
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+from pathlib import Path
+from typing import Callable, TypeVar
+
+from .indexer import INDEX_KEY_LENGTH
+
+
+# Кеш загруженных словарей. Рядом со словарем, в папке CACHE_DIR_NAME, сохраняется его откомпилированная форма —
+# правила, шаблоны и замороженный индекс. При следующей загрузке, если исходный файл не изменился, словарь
+# восстанавливается из кеша без разбора строк и построения индекса.
+# Кеш привязан к формату словаря и длине ключа индекса. Изменение исходного файла определяется по времени изменения
+# и размеру, а при их несовпадении — по хешу содержимого (файл мог быть перезаписан без изменений).
+
+CACHE_DIR_NAME = '__dicache__'  # None — кеш отключен
+CACHE_VERSION = 9
+
+_MAGIC = b'DICRCACH'
+_HEADER_SIZE = struct.Struct('<I')
+
+T = TypeVar('T')
+
+
+def cache_path(path: Path, options: dict=None) -> Path:
+    name = path.name
+    if options:  # словарь с разными параметрами кешируется в разные файлы
+        name += '.' + hashlib.blake2b(_options_repr(options).encode(), digest_size=4).hexdigest()
+    return path.parent / CACHE_DIR_NAME / (name + '.pickle')
+
+
+def _options_repr(options: dict) -> str:
+    return repr(sorted(options.items()))
+
+
+def file_digest(path: Path) -> str:
+    with path.open('rb') as handle:
+        return hashlib.file_digest(handle, 'blake2b').hexdigest()
+
+
+def _signature(path: Path, cls: type, options: dict) -> tuple:
+    """Параметры, при несовпадении которых кеш недействителен независимо от содержимого словаря"""
+    return CACHE_VERSION, path.suffix, f'{cls.__module__}.{cls.__qualname__}', INDEX_KEY_LENGTH, _options_repr(options)
+
+
+def _read(path: Path, cache: Path, signature: tuple):
+    with cache.open('rb') as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:len(_MAGIC)] != _MAGIC:
+            return None
+        start = len(_MAGIC) + _HEADER_SIZE.size
+        header_size, = _HEADER_SIZE.unpack_from(mm, len(_MAGIC))
+        stop = start + header_size
+        cached_signature, mtime, size, digest = pickle.loads(mm[start:stop])
+        if cached_signature != signature:
+            return None
+        stat = path.stat()
+        if (stat.st_mtime_ns, stat.st_size) != (mtime, size) and file_digest(path) != digest:
+            return None
+        with memoryview(mm) as buffer, buffer[stop:] as data:
+            return pickle.loads(data)
+
+
+def _write(path: Path, cache: Path, signature: tuple, dictionary):
+    data = pickle.dumps(dictionary, protocol=pickle.HIGHEST_PROTOCOL)
+    stat = path.stat()
+    header = pickle.dumps((signature, stat.st_mtime_ns, stat.st_size, file_digest(path)),
+                          protocol=pickle.HIGHEST_PROTOCOL)
+    cache.parent.mkdir(exist_ok=True)
+    temp = cache.with_name(f'{cache.name}.{os.getpid()}.tmp')
+    try:
+        with temp.open('wb') as handle:
+            handle.write(_MAGIC)
+            handle.write(_HEADER_SIZE.pack(len(header)))
+            handle.write(header)
+            handle.write(data)
+    except OSError:
+        temp.unlink(missing_ok=True)
+        raise
+    os.replace(temp, cache)  # атомарная замена, параллельно загружающиеся процессы не увидят частично записанный файл
+
+
+def cached(path: Path, cls: type, make: Callable[[], T], options: dict=None) -> T:
+    """Загрузка словаря из кеша. При отсутствии или недействительности кеша словарь создается функцией make
+    и сохраняется в кеш. Ошибки работы с кешем не мешают загрузке, словарь просто создается заново."""
+    if CACHE_DIR_NAME is None:
+        return make()
+    options = options or {}
+    cache = cache_path(path, options)
+    signature = _signature(path, cls, options)
+    try:
+        dictionary = _read(path, cache, signature)
+    except (OSError, ValueError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        dictionary = None
+    if dictionary is None:
+        dictionary = make()
+        store(path, cls, dictionary, options)
+    return dictionary
+
+
+def store(path: Path, cls: type, dictionary, options: dict=None):
+    """Сохранение в кеш словаря, созданного без cached, например перезагруженного после изменения файла"""
+    if CACHE_DIR_NAME is None:
+        return
+    options = options or {}
+    try:
+        _write(path, cache_path(path, options), _signature(path, cls, options), dictionary)
+    except (OSError, pickle.PicklingError, TypeError, AttributeError):
+        pass  # словарь с несериализуемыми правилами (например функции сайд-модуля) не кешируется
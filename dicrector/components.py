@@ -1,19 +1,36 @@
+import asyncio
 import operator
 import re
 import sys
-from dataclasses import dataclass
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from copy import copy
+from dataclasses import dataclass, field
 from enum import Enum
 from pathlib import Path
-
+from time import perf_counter
+from functools import wraps
+from heapq import heappop, heappush
+from itertools import accumulate, count
 from types import ModuleType
-from typing import Protocol, Callable, Self, Optional, Generator
+from typing import Protocol, Callable, Self, Optional, Generator, Iterable, Iterator, NamedTuple, Sequence, \
+    Awaitable, Coroutine
 
-from .indexer import IIndexed, Indexer, Wildcard
+from . import compiled
+from .indexer import IIndexed, Indexer, AutomatonIndexer, Wildcard
 from .loaders import LoadDepends, TPatternData, TTargetData
+from .textparse import yo_folded
+
+try:  # внутренние модули re, устройство которых может меняться от версии к версии CPython, см. RE_INTERNALS
+    from re import _casefix, _compiler as sre_compile, _constants as sre, _parser as sre_parse
+except ImportError:
+    _casefix = sre_compile = sre = sre_parse = None
 
 
 class ITextNode(Protocol):
     text: str
+    def normalized(self, fold_yo: bool=False) -> str: ...
 
 
 # ========== Pattern ==================================================================
@@ -34,11 +51,15 @@ class PatternFake:
 
 
 class PatternConst:
-    __slots__ = ('_pattern', 'case_sensitive')
+    """Шаблон, сравниваемый со всем текстом. Без учета регистра сравнивается с текстом в нижнем регистре,
+    а с fold_yo — еще и с е вместо ё. Этот нормализованный текст можно передать в match готовым
+    (ITextNode.normalized), чтобы не вычислять его для каждого правила"""
+    __slots__ = ('_pattern', 'case_sensitive', 'fold_yo')
     wildcard = Wildcard.none
-    def __init__(self, pattern: str, case_sensitive: bool):
-        self._pattern = pattern
+    def __init__(self, pattern: str, case_sensitive: bool, fold_yo: bool=False):
+        self._pattern = yo_folded(pattern) if fold_yo and not case_sensitive else pattern
         self.case_sensitive = case_sensitive
+        self.fold_yo = fold_yo
 
     @classmethod
     def from_str(cls, pattern: str) -> Self:
@@ -51,11 +72,25 @@ class PatternConst:
 
     @property
     def key(self):
-        return self._pattern
+        # ключ индекса нормализуется как текст, по которому ищется. Регистрозависимый шаблон сравнивается
+        # с текстом как есть
+        return yo_folded(self._pattern) if self.fold_yo and self.case_sensitive else self._pattern
+
+    def __reduce__(self):
+        return self.__class__, (self._pattern, self.case_sensitive, self.fold_yo)
+
+    def with_fold_yo(self) -> Self:
+        """Копия шаблона, не различающая ё и е"""
+        cls, args = self.__reduce__()
+        return cls(*args[:-1], True)
 
-    def match(self, string: str) -> bool:
+    def normalize(self, string: str) -> str:
+        string = string.lower()
+        return yo_folded(string) if self.fold_yo else string
+
+    def match(self, string: str, normalized: str=None) -> bool:
         if not self.case_sensitive:
-            string = string.lower()
+            string = self.normalize(string) if normalized is None else normalized
         return self._pattern == string
 
     # noinspection PyUnusedLocal
@@ -65,8 +100,8 @@ class PatternConst:
 
 
 class PatternWildcard(PatternConst):
-    def __init__(self, pattern: str, case_sensitive: bool, wildcard: Wildcard):
-        super().__init__(pattern, case_sensitive)
+    def __init__(self, pattern: str, case_sensitive: bool, wildcard: Wildcard, fold_yo: bool=False):
+        super().__init__(pattern, case_sensitive, fold_yo)
         if wildcard == Wildcard.none:
             self._compare = operator.eq
             # замену оставляем на предка
@@ -95,13 +130,13 @@ class PatternWildcard(PatternConst):
         wildcard = (wcl, wcr)
         return cls(pattern, case_sensitive, Wildcard(wildcard))
 
-    @property
-    def key(self):
-        return self._pattern
+    def __reduce__(self):
+        # сохраняем только исходные данные, методы сравнения и замены назначаются конструктором
+        return self.__class__, (self._pattern, self.case_sensitive, self.wildcard, self.fold_yo)
 
-    def match(self, string: str) -> bool:
+    def match(self, string: str, normalized: str=None) -> bool:
         if not self.case_sensitive:
-            string = string.lower()
+            string = self.normalize(string) if normalized is None else normalized
         return self._compare(string, self._pattern)
 
     def _replace_wc_left(self, replace: str, string: str) -> str:
@@ -113,18 +148,47 @@ class PatternWildcard(PatternConst):
     def _replace_wc_right(self, replace: str, string: str) -> str:  # также both
         if not self.case_sensitive:
             string = string.lower()
+            if self.fold_yo:  # ё и е не различаются только при поиске, остаток слова сохраняет ё
+                start = yo_folded(string).find(self._pattern)
+                if start < 0:
+                    return string
+                return string[:start] + replace + string[start + len(self._pattern):]
         return string.replace(self._pattern, replace, 1)
 
 
 class PatternRe:
-    __slots__ = ('match', 'replace')
+    __slots__ = ('match', 'replace', '_source')
     def __init__(self, pattern: str, case_sensitive: bool):
         pattern = pattern.replace(' ', '\s')
         flags = 0 if case_sensitive else re.IGNORECASE
-        re_pattern = re.compile(pattern, flags=flags)
+        self._source = pattern, flags
+        self._compile()
+
+    def _compile(self):
+        re_pattern = re.compile(*self._source)
         self.match = re_pattern.search
         self.replace = re_pattern.sub
 
+    def __getstate__(self):
+        # Откомпилированное выражение не сохраняется. После восстановления компиляция происходит при первом
+        # использовании, что для индексных словарей означает — только для правил прошедших отбор по индексу.
+        return getattr(self, '__dict__', None), self._source
+
+    def __setstate__(self, state):
+        dict_, self._source = state
+        if dict_:
+            self.__dict__.update(dict_)
+        self.match = self._lazy_match
+        self.replace = self._lazy_replace
+
+    def _lazy_match(self, string: str):
+        self._compile()
+        return self.match(string)
+
+    def _lazy_replace(self, replace, string: str) -> str:
+        self._compile()
+        return self.replace(replace, string)
+
     @classmethod
     def from_str(cls, pattern: str) -> Self:
         case_sensitive = pattern[0] == '$'
@@ -132,8 +196,173 @@ class PatternRe:
             pattern = pattern[case_sensitive:]
         return cls(pattern, case_sensitive)
 
+    @property
+    def literal(self) -> str:
+        """Самая длинная подстрока, обязательно присутствующая в любом найденном тексте. Пустая строка, если
+        выделить ее невозможно. Возвращается в нижнем регистре, свернутом функцией fold_case"""
+        if not RE_INTERNALS:
+            return ''
+        try:
+            return _literal(*self._source)
+        except (re.error, ValueError, TypeError, AttributeError, IndexError):
+            return ''
+
+    def joined(self) -> tuple[Callable, int] | None:
+        """Поиск сразу по тексту нескольких нод, каждой из которых предшествует '\\n' (см. DictionaryRe,
+        joined_scan), и сдвиг начала совпадения перед началом ноды. Ни одна часть выражения не совпадает
+        с '\\n', а начало и конец текста (^, $, \\A, \\Z) — начало и конец строки. Поэтому совпадение
+        не выходит за пределы ноды и найдено в ноде тогда и только тогда, когда его находит match в тексте
+        самой ноды (если в нем нет '\\n'). Начальный ^ заменяется предшествующим ноде '\\n', со сдвигом 1:
+        начинающееся с символа выражение ищется быстрым поиском этого символа, а не проверкой каждой позиции.
+        None, если выражение перестроить не удалось"""
+        if not RE_INTERNALS:
+            return None
+        try:
+            return _joined_search(*self._source)
+        except (re.error, ValueError, TypeError, AttributeError, IndexError):
+            return None
+
+
+def _literal(pattern: str, flags: int) -> str:
+    literals = []
+    _required_literals(sre_parse.parse(pattern, flags), literals)
+    return fold_case(max(literals, key=len, default='').lower())
+
+
+def _joined_search(pattern: str, flags: int) -> tuple[Callable, int]:
+    parsed = sre_parse.parse(pattern, flags)
+    _line_bounded(parsed, bool(parsed.state.flags & sre.SRE_FLAG_DOTALL))
+    shift = 0
+    if parsed.data and parsed.data[0] == (sre.AT, sre.AT_BEGINNING_LINE):
+        parsed.data[0] = sre.LITERAL, _NEWLINE
+        shift = 1
+    return sre_compile.compile(parsed, flags).search, shift
+
+
+def _required_literals(items, literals: list[str]):
+    """Собирает последовательности символов, без которых выражение не может совпасть. Альтернативы,
+    необязательные и отрицательные части пропускаются"""
+    run = []
+    for op, av in items:
+        if op is sre.LITERAL:
+            run.append(chr(av))
+            continue
+        if run:
+            literals.append(''.join(run))
+            run = []
+        if op is sre.SUBPATTERN:
+            _required_literals(av[-1], literals)
+        elif op is sre.ATOMIC_GROUP:
+            _required_literals(av, literals)
+        elif op is sre.ASSERT:
+            _required_literals(av[1], literals)
+        elif op in _REPEATS and av[0] >= 1:
+            _required_literals(av[2], literals)
+    if run:
+        literals.append(''.join(run))
+
+
+def _line_bounded(items, dotall: bool):
+    """Изменяет разобранное выражение на месте (см. PatternRe.joined): символы и наборы символов, совпадающие
+    с '\\n', дополняются его исключением, сам '\\n' не совпадает ни с чем, границы текста заменяются границами
+    строки. Внутри ноды выражение совпадает с тем же, что и прежде"""
+    state = items.state
+    for k, (op, av) in enumerate(items.data):
+        if op is sre.LITERAL and av == _NEWLINE:
+            items.data[k] = sre.ASSERT_NOT, (1, sre_parse.SubPattern(state))  # (?!)
+        elif op is sre.NOT_LITERAL:
+            items.data[k] = sre.IN, [(sre.NEGATE, None), (sre.LITERAL, av), (sre.LITERAL, _NEWLINE)]
+        elif op is sre.ANY and dotall:
+            items.data[k] = sre.IN, [(sre.NEGATE, None), (sre.LITERAL, _NEWLINE)]
+        elif op is sre.IN:
+            if av[0][0] is sre.NEGATE:
+                av.append((sre.LITERAL, _NEWLINE))
+            elif any(_set_item_newline(item) for item in av):  # (?:(?!\n)[...])
+                newline = sre_parse.SubPattern(state, [(sre.LITERAL, _NEWLINE)])
+                guarded = sre_parse.SubPattern(state, [(sre.ASSERT_NOT, (1, newline)), (op, av)])
+                items.data[k] = sre.SUBPATTERN, (None, 0, 0, guarded)
+        elif op is sre.AT:
+            items.data[k] = op, _LINE_BOUNDS.get(av, av)
+        elif op is sre.SUBPATTERN:
+            _, add_flags, del_flags, sub = av
+            _line_bounded(sub, (dotall or bool(add_flags & sre.SRE_FLAG_DOTALL))
+                          and not del_flags & sre.SRE_FLAG_DOTALL)
+        elif op in _REPEATS:
+            _line_bounded(av[2], dotall)
+        elif op is sre.BRANCH:
+            for sub in av[1]:
+                _line_bounded(sub, dotall)
+        elif op is sre.ATOMIC_GROUP:
+            _line_bounded(av, dotall)
+        elif op in (sre.ASSERT, sre.ASSERT_NOT):
+            _line_bounded(av[1], dotall)
+        elif op is sre.GROUPREF_EXISTS:
+            for sub in av[1:]:
+                if sub is not None:
+                    _line_bounded(sub, dotall)
+        elif not (op is sre.LITERAL or op is sre.ANY or op is sre.GROUPREF):
+            raise ValueError(f'неизвестная операция выражения {op}')  # неизвестно, может ли совпасть с '\n'
+
+
+def _set_item_newline(item: tuple) -> bool:
+    """Элемент набора символов [...] совпадает с '\\n'"""
+    op, av = item
+    if op is sre.LITERAL:
+        return av == _NEWLINE
+    if op is sre.RANGE:
+        return av[0] <= _NEWLINE <= av[1]
+    return op is sre.CATEGORY and av in _NEWLINE_CATEGORIES
+
+
+_NEWLINE = ord('\n')
+try:
+    _REPEATS = {sre.MAX_REPEAT, sre.MIN_REPEAT, sre.POSSESSIVE_REPEAT}
+    _NEWLINE_CATEGORIES = {sre.CATEGORY_SPACE, sre.CATEGORY_NOT_WORD, sre.CATEGORY_NOT_DIGIT, sre.CATEGORY_LINEBREAK}
+    _LINE_BOUNDS = {sre.AT_BEGINNING: sre.AT_BEGINNING_LINE, sre.AT_BEGINNING_STRING: sre.AT_BEGINNING_LINE,
+                    sre.AT_END: sre.AT_END_LINE, sre.AT_END_STRING: sre.AT_END_LINE}
+    # re.IGNORECASE, кроме обычной смены регистра, считает равными некоторые символы (например 'в' и 'ᲀ', 's' и 'ſ'),
+    # не совпадающие после str.lower(). Такие символы сворачиваются к одному представителю.
+    _CASE_FOLD = {char: min(char, *equal) for char, equal in _casefix._EXTRA_CASES.items()
+                  if min(char, *equal) != char}
+except AttributeError:  # модулей нет или они устроены иначе
+    _REPEATS = _NEWLINE_CATEGORIES = frozenset()
+    _LINE_BOUNDS = _CASE_FOLD = {}
+_FOLDABLE = re.compile('[%s]' % ''.join(map(re.escape, map(chr, _CASE_FOLD)))) if _CASE_FOLD else None
+
+
+def fold_case(string: str) -> str:
+    # translate со словарем обращается к нему для каждого символа, а сворачиваемые символы в тексте редки
+    if _FOLDABLE is None or _FOLDABLE.search(string) is None:
+        return string
+    return string.translate(_CASE_FOLD)
+
+
+def _re_internals_work() -> bool:
+    """Разбор и сборка выражений внутренними модулями re дают ожидаемый результат (проверено на CPython 3.11-3.13)"""
+    if not _CASE_FOLD:
+        return False
+    try:
+        search, shift = _joined_search(r'^(?:при)?вет[^а]?\w*\Z', re.IGNORECASE)
+        return (_literal(r'\b(?:при)?вет(\w+)\s', 0) == 'вет' and fold_case('ᲀ') == 'в' and shift == 1
+                and search('\nпри\nВЕТЕР', 0).start() == 4 and search('\nприв\nет', 0) is None)
+    except Exception:  # noqa — любая ошибка означает несовместимость
+        return False
+
+
+# Без внутренних модулей re или при их несовместимости правила rex, rexw и dicx проверяются без отбора по
+# обязательной подстроке (PatternRe.literal, PatternDicx.literals) и без DictionaryRe joined_scan
+RE_INTERNALS = _re_internals_work()
+
 
 # ========== Rule =====================================================================
+class CachePolicy(Enum):
+    """Допустимость кеширования результата обработки слова. Объявляется атрибутом cache_policy функции или
+    объекта, вычисляющего замену. Без объявления считается pure"""
+    pure = 1        # результат зависит только от текста слова
+    first_word = 2  # а также от того, является ли слово первым в предложении
+    none = 3        # зависит от контекста или имеет побочные эффекты (например сбор статистики)
+
+
 class ITargetResolved(Protocol):
     def __call__(self, node: ITextNode) -> str | None: ...
 
@@ -156,6 +385,11 @@ class Rule:
         target = self.target
         node.text = self.pattern.replace(target, node.text)
 
+    def apply_batch(self, nodes: Iterable[ITextNode]):
+        for node in nodes:
+            if self.pattern.match(node.text):
+                self.apply(node)
+
 
 class RuleResolved(Rule):
     """Правило заменяющее найденный шаблон на текст, полученный на основе обработки содержимого обрабатываемой ноды"""
@@ -164,27 +398,110 @@ class RuleResolved(Rule):
         if target is not None:  # resolver имеет тип Optional[str]
             node.text = self.pattern.replace(target, node.text)
 
+    def apply_batch(self, nodes: Iterable[ITextNode]):
+        if not isinstance(self.target, ResolverBatch):
+            return super().apply_batch(nodes)
+        nodes = [node for node in nodes if self.pattern.match(node.text)]
+        if nodes:
+            for node, target in zip(nodes, self.target.batch(nodes), strict=True):
+                if target is not None:
+                    node.text = self.pattern.replace(target, node.text)
+
+
+class ITargetBatch(Protocol):
+    def __call__(self, nodes: list[ITextNode]) -> list[str | None]: ...
+
+
+class BatchInfo(NamedTuple):
+    calls: int
+    nodes: int
+    max_size: int
+    seconds: float
+
+
+class ResolverBatch:
+    """Вычисление замен для набора нод одним вызовом внешнего обработчика, которому выгоднее передавать данные
+    пакетами (модели ruaccent, silero-stress). Одиночная нода обрабатывается resolver, а без него — пакетом из
+    одной ноды. Ведется статистика вызовов, размеров пакетов и времени обработки"""
+    def __init__(self, batch: ITargetBatch, resolver: ITargetResolved = None):
+        self._batch = batch
+        self._resolver = resolver
+        self.cache_policy = getattr(batch, 'cache_policy', getattr(resolver, 'cache_policy', CachePolicy.pure))
+        self.calls = self.nodes = self.max_size = 0
+        self.seconds = 0.0
+
+    def __call__(self, node: ITextNode) -> str | None:
+        if self._resolver is not None:
+            return self._resolver(node)
+        return self.batch([node])[0]
+
+    def batch(self, nodes: list[ITextNode]) -> list[str | None]:
+        start = perf_counter()
+        targets = self._batch(nodes)
+        self.seconds += perf_counter() - start
+        self.calls += 1
+        self.nodes += len(nodes)
+        self.max_size = max(self.max_size, len(nodes))
+        return targets
+
+    def batch_info(self) -> BatchInfo:
+        return BatchInfo(self.calls, self.nodes, self.max_size, self.seconds)
+
+
+# loop — цикл событий AsyncCorrector, для потока которого ведется обработка, runner — собственный цикл потока
+_async_local = threading.local()
+
+
+def run_coroutine(coroutine: Coroutine):
+    """Результат корутины асинхронного обработчика, вызванного синхронной обработкой. В потоке AsyncCorrector
+    корутина выполняется в цикле событий сервиса, с его соединениями и ресурсами, а поток ожидает результат.
+    В остальных потоках и процессах — в собственном цикле событий потока"""
+    loop = getattr(_async_local, 'loop', None)
+    if loop is not None:
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+    runner = getattr(_async_local, 'runner', None)
+    if runner is None:
+        runner = _async_local.runner = asyncio.Runner()
+    return runner.run(coroutine)
+
+
+def awaited(func: Callable[..., Awaitable]) -> Callable:
+    """Синхронная обертка асинхронной функции обработчика (async def corrector(node)). Атрибуты функции,
+    например cache_policy, сохраняются"""
+    @wraps(func)
+    def wrapper(*args):
+        return run_coroutine(func(*args))
+    return wrapper
+
 
 # ========== Dictionary ===============================================================
 TModuleLoader = Callable[[], Optional[ModuleType]]
 
+# Хеши строк str случайны для каждого процесса (PYTHONHASHSEED), поэтому сохраненные хеши строк словаря действительны
+# только в процессе, где вычислены, или при одинаковом PYTHONHASHSEED. Проверяется по хешу этой строки
+ROW_HASH_SALT = hash('dicrector')
+
 # TODO возможно надо кеширование @cache
+def side_module_path(dct_path: Path) -> Path:
+    """Файл модуля функций словаря. Для словаря test.dic — test_dic.py в той же папке"""
+    path = dct_path.resolve()
+    return path.parent / (path.name.replace('.', '_') + '.py')
+
+
 def side_module(dct_path: Path) -> TModuleLoader:
-    """Ленивая загрузка модуля функций словаря. Имя файла модуля для словаря test.dic, должно быть test_dic.py"""
+    """Ленивая загрузка модуля функций словаря, см. side_module_path"""
     module = 'None'  # строка, по причине опциональности значения, допускает None
     def _lazy_import() -> Optional[ModuleType]:
         nonlocal module
         if module != 'None':
             # noinspection PyTypeChecker
             return module
-        path = dct_path.resolve()
-        name = path.name.replace('.', '_')
-        full_path = path.parent / (name + '.py')
+        full_path = side_module_path(dct_path)
         if full_path.exists():
-            parent = str(path.parent)
+            parent = str(full_path.parent)
             if parent not in sys.path:
                 sys.path.append(parent)
-            module = __import__(name)
+            module = __import__(full_path.stem)
         else:
             module = None
         return module
@@ -193,19 +510,42 @@ def side_module(dct_path: Path) -> TModuleLoader:
 
 class Dictionary:
     """Словарь, список правил, каждое из которых проверяется на возможность применения к обрабатываемой ноде"""
+    batched = False  # правила обрабатывают ноды пакетами, см. DictionaryBatch
+    picklable = True  # словарь с фиксированными заменами сериализуется (передается процессом загрузки)
+
     def __init__(self, rules: list[Rule], path: Path=None):
         self.rules = rules
         self.path = path
 
     @classmethod
     def load(cls, path: Path, depends: 'Depends') -> Self:
-        module = side_module(path)
+        return cls.from_rows(cls.read_rows(path, depends), path, depends)
+
+    @staticmethod
+    def read_rows(path: Path, depends: 'Depends') -> Iterator[tuple[TPatternData, TTargetData]]:
         load = depends.load
-        rules_data = (load.prepare(row) for row in load.loader(path))
+        return (load.prepare(row) for row in load.loader(path))
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple[TPatternData, TTargetData]], path: Path, depends: 'Depends') -> Self:
+        module = side_module(path)
         rule_maker = depends.rule_maker
         rules = [rule_maker(pattern_data, target_data, depends, module)
-                 for pattern_data, target_data in rules_data]
-        return cls(rules, path)
+                 for pattern_data, target_data in rows]
+        return cls(rules, path, **depends.options)
+
+    def reload(self, depends: 'Depends') -> Self:
+        """Словарь по измененному файлу self.path. Текущий словарь не изменяется и может применяться во время
+        перезагрузки"""
+        return depends.dict_maker(self.path, depends)
+
+    def candidates(self, node: ITextNode) -> Sequence:
+        """Правила (или их номера), проверяемые для ноды. Для статистики избирательности индекса"""
+        return self.rules
+
+    def rejects(self, node: ITextNode) -> bool:
+        """Поиск по индексу для ноды пропускается фильтром индекса (RejectFilter). Для статистики"""
+        return False
 
     def rules_for(self, node: ITextNode) -> Generator[Rule, None, None]:
         return (rule for rule in self.rules if rule.pattern.match(node.text))
@@ -214,26 +554,447 @@ class Dictionary:
         for rule in self.rules_for(node):
             rule.apply(node)
 
+    def apply_batch(self, nodes: Iterable[ITextNode]):
+        for node in nodes:
+            self.apply(node)
+
+    @property
+    def cache_policy(self) -> CachePolicy:
+        """Наиболее строгая политика кеширования среди вычисляемых замен словаря"""
+        policies = (getattr(rule.target, 'cache_policy', CachePolicy.pure)
+                    for rule in self.rules if callable(rule.target))
+        return max(policies, key=lambda p: p.value, default=CachePolicy.pure)
+
+
+class DictionaryBatch(Dictionary):
+    """Словарь, каждое правило которого применяется сразу ко всем нодам строки (пакета строк execute_many), что
+    позволяет правилу с ResolverBatch обработать их одним вызовом"""
+    def apply_batch(self, nodes: Iterable[ITextNode]):
+        nodes = list(nodes)
+        for rule in self.rules:
+            rule.apply_batch(nodes)
+
+    @property
+    def batched(self) -> bool:
+        return any(isinstance(rule.target, ResolverBatch) for rule in self.rules)
+
 
 class DictionaryIndex(Dictionary):
     """Словарь, список правил, часть которых проверяется на возможность применения к обрабатываемой ноде. Эта часть
     определяется на основании быстрого поиска по индексу содержимого ноды. Например для ноды(text='слово') будут
-    отобраны только правила 'слово=замена' и 'слов*=заме' """
-    def __init__(self, rules: list[Rule], path: Path=None):
+    отобраны только правила 'слово=замена' и 'слов*=заме'. Правила без маски, обычно составляющие большинство,
+    отбираются одним обращением к словарю по тексту ноды в нижнем регистре, индекс проверяется только при
+    наличии правил с маской. fold_yo — правила без учета регистра не различают ё и е (шаблоны PatternConst).
+    merge_index — в WordChain правила с маской ищутся по общему индексу с соседними словарями с этим же
+    параметром (MergedIndex). Общий индекс занимает столько же памяти, сколько индексы словарей вместе"""
+    def __init__(self, rules: list[Rule], path: Path=None, indexer: type=Indexer, fold_yo: bool=False,
+                 merge_index: bool=False):
+        self.fold_yo = fold_yo
+        self.merge_index = merge_index
+        if fold_yo:
+            rules = [self._folded(rule) for rule in rules]
         super().__init__(rules, path)
-        self._index = self.make_index(rules)
+        self._exact, self._index = self.make_index(rules, indexer)
+        self._row_hashes = None  # (ROW_HASH_SALT, хеши строк файла по порядку правил), см. reload
+        # шаблоны PatternConst сравниваются с нормализованным текстом ноды, общим для всех правил
+        self._match_normalized = all(isinstance(rule.pattern, PatternConst) for rule in rules)
 
-    @staticmethod
-    def make_index(rules: list[Rule]):
-        index = Indexer()
+    @classmethod
+    def load(cls, path: Path, depends: 'Depends') -> Self:
+        """Загрузка с использованием кеша откомпилированных словарей"""
+        return compiled.cached(path, cls, lambda: cls._load_hashed(path, depends), depends.options)
+
+    @classmethod
+    def _load_hashed(cls, path: Path, depends: 'Depends') -> Self:
+        hashes = array('q')
+        dictionary = cls.from_rows(_hashed(cls.read_rows(path, depends), hashes), path, depends)
+        dictionary._row_hashes = ROW_HASH_SALT, hashes
+        return dictionary
+
+    def reload(self, depends: 'Depends') -> Self:
+        """Строки измененного файла сравниваются с прошлой загрузкой по хешам. Правила неизмененных строк
+        переиспользуются, создаются только правила новых строк. В копии индекса номера правил сдвигаются,
+        удаляются и добавляются только для изменений (Indexer.update), полностью индекс не строится.
+        Словарь создается заново, если хеши недействительны (словарь восстановлен из кеша процессом с другим
+        PYTHONHASHSEED)"""
+        path = self.path
+        hashes = array('q')
+        rows = list(_hashed(self.read_rows(path, depends), hashes))
+        if self._row_hashes is not None and self._row_hashes[0] == ROW_HASH_SALT:
+            dictionary = self._patched(rows, _matching_blocks(self._row_hashes[1], hashes), depends)
+        else:
+            dictionary = type(self).from_rows(rows, path, depends)
+        dictionary._row_hashes = ROW_HASH_SALT, hashes
+        compiled.store(path, type(self), dictionary, depends.options)
+        return dictionary
+
+    def _patched(self, rows: list[tuple], blocks: list[tuple[int, int, int]], depends: 'Depends') -> Self:
+        """Копия словаря с правилами rows. blocks — совпадающие участки (начало в старых правилах, начало
+        в новых, длина)"""
+        old_rules = self.rules
+        remap = array('i', [-1]) * len(old_rules)  # старый номер правила: новый, -1 — удалено
+        rules = [None] * len(rows)
+        for old_start, new_start, size in blocks:
+            remap[old_start:old_start + size] = array('i', range(new_start, new_start + size))
+            rules[new_start:new_start + size] = old_rules[old_start:old_start + size]
+        module = side_module(self.path)
+        added = [i for i, rule in enumerate(rules) if rule is None]
+        for i in added:
+            pattern_data, target_data = rows[i]
+            rules[i] = depends.rule_maker(pattern_data, target_data, depends, module)
+            if self.fold_yo:
+                rules[i] = self._folded(rules[i])
+        shifted = any(old_start != new_start for old_start, new_start, size in blocks if size)
+
+        exact = {} if shifted else self._exact.copy()
+        if shifted:  # сдвинуты номера всех последующих правил
+            keys = self._exact.keys()
+        else:
+            keys = {old_rules[i].pattern.key.lower() for i, new in enumerate(remap)
+                    if new < 0 and self._indexed(old_rules[i].pattern) is None}
+        for key in keys:
+            found = self._exact[key]
+            found = tuple(new for i in (found if isinstance(found, tuple) else (found,)) if (new := remap[i]) >= 0)
+            if found:
+                exact[key] = found[0] if len(found) == 1 else found
+            else:
+                exact.pop(key, None)
+        wildcard_added = []
+        for i in added:
+            pattern = rules[i].pattern
+            indexed = self._indexed(pattern)
+            if indexed is not None:
+                wildcard_added.append((indexed, i))
+                continue
+            key = pattern.key.lower()
+            found = exact.get(key)
+            exact[key] = i if found is None else tuple(sorted((*(found if isinstance(found, tuple) else (found,)), i)))
+
+        index = self._index
+        if index is None or not hasattr(index, 'update'):
+            if wildcard_added or index is not None:  # индекс без update строится заново
+                _, index = self.make_index(rules, type(index) if index else depends.options.get('indexer', Indexer))
+        else:
+            index = copy(index)
+            index.update(remap, wildcard_added)
+
+        dictionary = copy(self)
+        dictionary.rules, dictionary._exact, dictionary._index = rules, exact, index
+        return dictionary
+
+    @classmethod
+    def make_index(cls, rules: list[Rule], indexer: type=Indexer):
+        """Словарь правил без маски — ключ в нижнем регистре: номер правила или кортеж номеров, если правил
+        с ключом несколько (регистрозависимые варианты), и индекс правил с маской или None, если таких нет"""
+        exact = {}
+        index = indexer()
+        indexed = False
         for i, rule in enumerate(rules):
-            index.add(rule.pattern, i)
+            pattern = cls._indexed(rule.pattern)
+            if pattern is None:
+                key = rule.pattern.key.lower()
+                found = exact.get(key)
+                exact[key] = i if found is None else (*(found if isinstance(found, tuple) else (found,)), i)
+            else:
+                index.add(pattern, i)
+                indexed = True
         index.freeze()
-        return index
+        return exact, index if indexed else None
+
+    @staticmethod
+    def _indexed(pattern: IIndexed) -> IIndexed | None:
+        """Ключ правила в индексе или None — правило без маски отбирается словарем по тексту ноды целиком"""
+        return None if pattern.wildcard == Wildcard.none else pattern
+
+    @staticmethod
+    def _folded(rule: Rule) -> Rule:
+        if not isinstance(rule.pattern, PatternConst):
+            raise TypeError(f'fold_yo применим только к шаблонам PatternConst, не {type(rule.pattern).__name__}')
+        rule.pattern = rule.pattern.with_fold_yo()
+        return rule
+
+    def _candidates(self, normalized: str) -> list[int] | tuple[int, ...]:
+        """Номера правил, которые могут быть применены к тексту, по возрастанию. normalized — текст ноды
+        в нижнем регистре, с fold_yo словаря — и с е вместо ё (ITextNode.normalized)"""
+        found = self._exact.get(normalized, ())
+        if isinstance(found, int):
+            found = (found,)
+        if self._index is None:
+            return found
+        if not found:
+            return self._index.find(normalized)
+        return sorted((*found, *self._index.find(normalized)))
+
+    def candidates(self, node: ITextNode) -> Sequence[int]:
+        return self._candidates(node.normalized(self.fold_yo))
+
+    def rejects(self, node: ITextNode) -> bool:
+        return self._index is not None and self._index.rejects(node.normalized(self.fold_yo))
 
     def rules_for(self, node: ITextNode) -> Generator[Rule, None, None]:
-        return (rule for i in self._index[node.text]
-                if (rule := self.rules[i]).pattern.match(node.text))
+        fold_yo = self.fold_yo
+        rules = self.rules
+        text = node.text
+        normalized = node.normalized(fold_yo)
+        for i in self._candidates(normalized):
+            if node.text is not text:  # применено предыдущее правило
+                text = node.text
+                normalized = node.normalized(fold_yo)
+            rule = rules[i]
+            pattern = rule.pattern
+            if pattern.match(text, normalized) if self._match_normalized else pattern.match(text):
+                yield rule
+
+
+class MergedIndex:
+    """Общий индекс правил с маской идущих подряд словарей DictionaryIndex. Номер правила в общем индексе — номер
+    в словаре плюс число правил предыдущих словарей, поэтому один поиск по тексту ноды дает кандидатов всех
+    словарей, упорядоченных по словарю и правилу. Правила без маски отбираются словарем каждого словаря.
+    Применение словаря k к ноде равносильно DictionaryIndex.apply: кандидаты отбираются по тексту до применения,
+    после изменения текста поиск для следующих словарей повторяется. indexer — класс индексов словарей"""
+    def __init__(self, dictionaries: list[DictionaryIndex], indexer: type=Indexer):
+        self.dictionaries = dictionaries
+        self.fold_yo = dictionaries[0].fold_yo  # у всех словарей одинаковый, см. WordChain._merge
+        self._offsets = [0]
+        index = indexer()
+        indexed = False
+        for dictionary in dictionaries:
+            offset = self._offsets[-1]
+            for i, rule in enumerate(dictionary.rules):
+                pattern = dictionary._indexed(rule.pattern)
+                if pattern is not None:
+                    index.add(pattern, offset + i)
+                    indexed = True
+            self._offsets.append(offset + len(dictionary.rules))
+        index.freeze()
+        self._index = index if indexed else None
+
+    def candidates(self, k: int, normalized: str, scans: dict[str, list[int]]) -> Sequence[int]:
+        """Номера правил словаря k, как DictionaryIndex._candidates. scans — найденное в общем индексе по тексту,
+        общее для всех словарей и нод одного слова"""
+        found = self.dictionaries[k]._exact.get(normalized, ())
+        if isinstance(found, int):
+            found = (found,)
+        if self._index is None:
+            return found
+        indexed = scans.get(normalized)
+        if indexed is None:
+            indexed = scans[normalized] = self._index.find(normalized)
+        offset = self._offsets[k]
+        start = bisect_left(indexed, offset)
+        stop = bisect_left(indexed, self._offsets[k + 1], start)
+        if start == stop:
+            return found
+        indexed = [i - offset for i in indexed[start:stop]]
+        return sorted((*found, *indexed)) if found else indexed
+
+    def apply(self, k: int, node: ITextNode, scans: dict[str, list[int]]):
+        dictionary = self.dictionaries[k]
+        rules = dictionary.rules
+        fold_yo = self.fold_yo
+        text = node.text
+        normalized = node.normalized(fold_yo)
+        for i in self.candidates(k, normalized, scans):
+            if node.text is not text:
+                text = node.text
+                normalized = node.normalized(fold_yo)
+            rule = rules[i]
+            pattern = rule.pattern
+            if pattern.match(text, normalized) if dictionary._match_normalized else pattern.match(text):
+                rule.apply(node)
+
+
+def _hashed(rows: Iterable[tuple], hashes: array) -> Iterator[tuple]:
+    for row in rows:
+        hashes.append(hash(row))
+        yield row
+
+
+def _matching_blocks(old: array, new: array) -> list[tuple[int, int, int]]:
+    """Совпадающие участки последовательностей хешей строк: (начало в old, начало в new, длина), по возрастанию.
+    Общие начало и конец отделяются сразу. Середина проходится одновременно в обеих последовательностях: при
+    расхождении строка old, найденная дальше в new, означает вставку строк new до нее, и наоборот — удаление; из двух
+    вариантов выбирается более короткий, строки, не найденные нигде, считаются замененными"""
+    size = min(len(old), len(new))
+    prefix = 0
+    while prefix < size and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < size - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    old_stop, new_stop = len(old) - suffix, len(new) - suffix
+    blocks = [(0, 0, prefix)]
+    old_positions = _positions(old, prefix, old_stop)
+    new_positions = _positions(new, prefix, new_stop)
+    i = j = prefix
+    while i < old_stop and j < new_stop:
+        if old[i] == new[j]:
+            i_start, j_start = i, j
+            while i < old_stop and j < new_stop and old[i] == new[j]:
+                i += 1
+                j += 1
+            blocks.append((i_start, j_start, i - i_start))
+            continue
+        next_j = _next_position(new_positions, old[i], j)
+        next_i = _next_position(old_positions, new[j], i)
+        if next_i is None and next_j is None:
+            i += 1
+            j += 1
+        elif next_i is None or next_j is not None and next_j - j <= next_i - i:
+            j = next_j
+        else:
+            i = next_i
+    blocks.append((old_stop, new_stop, suffix))
+    return blocks
+
+
+def _positions(hashes: array, start: int, stop: int) -> dict[int, list[int]]:
+    positions = {}
+    for i in range(start, stop):
+        positions.setdefault(hashes[i], []).append(i)
+    return positions
+
+
+def _next_position(positions: dict[int, list[int]], value: int, start: int) -> int | None:
+    found = positions.get(value)
+    if found is None:
+        return None
+    pos = bisect_left(found, start)
+    return found[pos] if pos < len(found) else None
+
+
+JOINED_SCAN_SIZE = 1024  # символов текста нод в одном проходе правила, см. DictionaryRe joined_scan
+
+
+class DictionaryRe(Dictionary):
+    """Словарь регулярных выражений. Проверяются только правила, обязательная подстрока которых (PatternRe.literal)
+    есть в тексте ноды, и правила, для которых такую подстроку выделить не удалось. Порядок применения правил
+    сохраняется, после изменения текста ноды отбор повторяется для оставшихся правил.
+    joined_scan — apply_batch соединяет текст нод через '\\n' (блоками по JOINED_SCAN_SIZE символов) и ищет каждое
+    правило одним проходом по нему (PatternRe.joined), а не в каждой ноде отдельно. Найденное сопоставляется
+    с нодами по их позициям в соединенном тексте и применяется к каждой ноде обычным образом, результат тот же.
+    Правила применяются по очереди ко всем нодам, а не все правила к ноде, поэтому режим предназначен для нод
+    без дочек (уровень word, формат rexw) и действует, только если результат функций замены зависит лишь от текста
+    (CachePolicy.pure)"""
+    def __init__(self, rules: list[Rule], path: Path=None, indexer: type=AutomatonIndexer, joined_scan: bool=False):
+        super().__init__(rules, path)
+        self._index, self._unindexed = self.make_index(rules, indexer)
+        self.joined_scan = joined_scan and RE_INTERNALS and self.cache_policy == CachePolicy.pure
+        self._scanners = [None] * len(rules)  # PatternRe.joined(), компилируются при первом использовании
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_scanners'] = [None] * len(self.rules)  # выражения, собранные из разобранного дерева, не сериализуются
+        return state
+
+    @staticmethod
+    def make_index(rules: list[Rule], indexer: type=AutomatonIndexer):
+        index = indexer()
+        unindexed = []
+        for i, rule in enumerate(rules):
+            if literal := rule.pattern.literal:
+                index.add(PatternWildcard(literal, False, Wildcard.both), i)
+            else:
+                unindexed.append(i)
+        index.freeze()
+        return index, unindexed
+
+    def _candidates(self, normalized: str) -> list[int]:
+        return sorted(self._index.find(fold_case(normalized)) + self._unindexed)
+
+    def candidates(self, node: ITextNode) -> Sequence[int]:
+        return self._candidates(node.normalized())
+
+    def rejects(self, node: ITextNode) -> bool:
+        return self._index.rejects(fold_case(node.normalized()))
+
+    def rules_for(self, node: ITextNode, after: int=-1) -> Generator[Rule, None, None]:
+        """after — номер правила, после которого начинается проверка"""
+        text = node.text
+        candidates = self._candidates(node.normalized())
+        pos = bisect_right(candidates, after) if after >= 0 else 0
+        while pos < len(candidates):
+            i = candidates[pos]
+            pos += 1
+            rule = self.rules[i]
+            if rule.pattern.match(node.text):
+                yield rule
+                if node.text != text:  # правило применено, следующие правила отбираются по новому тексту
+                    text = node.text
+                    candidates = self._candidates(node.normalized())
+                    pos = bisect_right(candidates, i)
+
+    def apply_batch(self, nodes: Iterable[ITextNode]):
+        if not self.joined_scan:
+            return super().apply_batch(nodes)
+        block = []
+        size = 0
+        for node in nodes:
+            block.append(node)
+            size += len(node.text) + 1
+            if size >= JOINED_SCAN_SIZE:
+                self._apply_joined(block)
+                block = []
+                size = 0
+        if block:
+            self._apply_joined(block)
+
+    def _apply_joined(self, nodes: list[ITextNode]):
+        texts = [node.text for node in nodes]
+        text, starts = _joined(texts)
+        if text is None:
+            return super().apply_batch(nodes)
+        rules = self.rules
+        candidates = self._candidates(text.lower())  # отсортированный список — готовая куча
+        queued = set(candidates)
+        last = len(nodes) - 1
+        while candidates:
+            i = heappop(candidates)
+            rule = rules[i]
+            scanner = self._scanners[i]
+            if scanner is None:
+                scanner = self._scanners[i] = rule.pattern.joined() or (None, 0)
+            search, shift = scanner
+            changed = []
+            if search is None:  # выражение не перестраивается для соединенного текста — проверка каждого слова
+                for k, node in enumerate(nodes):
+                    rule.apply(node)
+                    if node.text != texts[k]:
+                        changed.append(k)
+            else:
+                pos = starts[0] - shift
+                while (found := search(text, pos)) is not None:
+                    k = bisect_right(starts, found.start() + shift) - 1
+                    node = nodes[k]
+                    rule.apply(node)
+                    if node.text != texts[k]:
+                        changed.append(k)
+                    if k == last:
+                        break
+                    pos = starts[k + 1] - shift
+            if not changed:
+                continue
+            for k in changed:  # следующие правила ищутся в новом тексте, с отбором по нему
+                texts[k] = nodes[k].text
+                for j in self._index.find(fold_case(nodes[k].normalized())):
+                    if j > i and j not in queued:
+                        heappush(candidates, j)
+                        queued.add(j)
+            text, starts = _joined(texts)
+            if text is None:  # замена добавила '\n' или удалила слово, остальные правила — к каждой ноде отдельно
+                for node in nodes:
+                    for rule in self.rules_for(node, i):
+                        rule.apply(node)
+                return
+
+
+def _joined(texts: list[str]) -> tuple[str | None, list[int]]:
+    """Тексты, каждому из которых предшествует '\\n', и их начала (с началом следующего за последним). None, если
+    '\\n' есть в самих текстах или есть пустой текст: в пустой строке \\B не совпадает, а между двумя '\\n' — да"""
+    text = '\n' + '\n'.join(texts)
+    if text.count('\n') > len(texts) or '' in texts:
+        return None, []
+    return text, list(map(operator.add, accumulate(map(len, texts), initial=1), count()))  # плюс '\n' перед каждым
 
 
 # ========== Process Depends ==========================================================
@@ -257,5 +1018,17 @@ class Depends:
     rule_maker: TRuleMaker
     pattern_maker: Callable
     target_maker: Optional[TTargetMaker] = None
+    options: dict = field(default_factory=dict)  # именованные параметры конструктора словаря
+
+    def fixed_traits(self, path: Path) -> tuple[CachePolicy, bool, bool] | None:
+        """Политика кеширования, пакетная обработка (batched) и сериализуемость словаря path, известные без его
+        загрузки, если все замены словаря — фиксированный текст: формат не вычисляет замены функциями
+        (target_maker) или у словаря нет модуля функций (side_module_path). None — определяются только
+        загруженным словарем"""
+        cls = getattr(self.dict_maker, '__self__', None)  # classmethod load класса словаря
+        if not isinstance(cls, type) or self.target_maker is not None and side_module_path(path).exists():
+            return None
+        batched = cls.batched is True  # свойство batched класса (DictionaryBatch) истинно лишь с функциями замен
+        return CachePolicy.pure, batched, cls.picklable
 
 
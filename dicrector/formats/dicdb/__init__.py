@@ -0,0 +1,16 @@
+from dicrector.components import Depends, ProcessLevel, RuleResolved, PatternFake
+from dicrector.formats.extw import prepare_fake_rule
+from dicrector.loaders import Loader, LoadDepends
+from .worker import DictionaryDb
+
+
+depends = Depends(
+    ProcessLevel.word,
+    LoadDepends(  # правила не загружаются, см. DictionaryDb.load
+        Loader.single,
+        prepare_fake_rule,
+    ),
+    dict_maker=DictionaryDb.load,
+    rule_maker=RuleResolved.from_,
+    pattern_maker=PatternFake,
+)
@@ -0,0 +1,118 @@
+import json
+import os
+import sqlite3
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Self
+
+from dicrector.components import Dictionary, ITextNode, Rule
+
+
+DB_CACHE_SIZE = 100_000  # слов в кеше результатов запросов
+DB_POOL_SIZE = 4  # простаивающих соединений в пуле
+DB_QUERY_LIMIT = 500  # слов в одном запросе, ограничение sqlite на число параметров — 999
+
+
+class ConnectionPool:
+    """Соединения с базой только для чтения. Соединение в каждый момент используется одним потоком, после
+    форка процесса соединения родителя не используются. connect_options — параметры sqlite3.connect"""
+    def __init__(self, db_path: Path, size: int = DB_POOL_SIZE, connect_options: dict = None):
+        self.uri = Path(db_path).resolve().as_uri() + '?mode=ro'
+        self.size = size
+        self.connect_options = {**(connect_options or {}), 'uri': True, 'check_same_thread': False}
+        self._reset()
+        _pools.add(self)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._idle = []
+
+    @contextmanager
+    def connection(self) -> sqlite3.Connection:
+        with self._lock:
+            con = self._idle.pop() if self._idle else None
+        if con is None:
+            con = sqlite3.connect(self.uri, **self.connect_options)
+        try:
+            yield con
+        finally:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append(con)
+                    con = None
+            if con is not None:
+                con.close()
+
+
+_pools = weakref.WeakSet()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=lambda: [pool._reset() for pool in _pools])
+
+
+class DictionaryDb(Dictionary):
+    """Словарь замен слов, хранящийся в базе sqlite. Правила в память не загружаются: все различные слова, поступившие
+    на обработку (строка или пакет строк execute_many), ищутся одним запросом, результаты запоминаются в кеше
+    ограниченного размера. query — запрос с {} на месте списка параметров, возвращающий пары (слово, замена),
+    connect_options — параметры sqlite3.connect, как в конфигурации Loader.sqlite"""
+    batched = True
+    picklable = False  # соединения с базой и блокировка
+
+    def __init__(self, rules: list[Rule], path: Path=None, db_path: Path=None, query: str='',
+                 case_sensitive: bool=False, cache_size: int=DB_CACHE_SIZE, pool_size: int=DB_POOL_SIZE,
+                 connect_options: dict=None):
+        super().__init__(rules, path)
+        self.query = query
+        self.case_sensitive = case_sensitive
+        self.cache_size = cache_size
+        self._pool = ConnectionPool(db_path, pool_size, connect_options)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Path, depends) -> Self:
+        """Файл словаря — json с путем к базе (относительно файла словаря) и запросом"""
+        config = json.loads(path.read_text(encoding='utf-8'))
+        db_path = path.parent / config.pop('db_path')
+        return cls([], path, db_path, **(config | depends.options))
+
+    def apply(self, node: ITextNode):
+        self.apply_batch((node,))
+
+    def apply_batch(self, nodes: Iterable[ITextNode]):
+        nodes = list(nodes)
+        keys = [node.text if self.case_sensitive else node.text.lower() for node in nodes]
+        targets = self.lookup(keys)
+        for node, key in zip(nodes, keys):
+            target = targets[key]
+            if target is not None:
+                node.text = target
+
+    def lookup(self, keys: Iterable[str]) -> dict[str, str | None]:
+        """Замены для слов, None — слова в базе нет"""
+        cache = self._cache
+        targets = {}
+        missing = []
+        with self._lock:
+            for key in set(keys):
+                if key in cache:
+                    cache.move_to_end(key)
+                    targets[key] = cache[key]
+                else:
+                    missing.append(key)
+        if not missing:
+            return targets
+
+        found = {}
+        with self._pool.connection() as con:
+            for i in range(0, len(missing), DB_QUERY_LIMIT):
+                chunk = missing[i:i + DB_QUERY_LIMIT]
+                found.update(con.execute(self.query.format(', '.join('?' * len(chunk))), chunk))
+        with self._lock:
+            for key in missing:
+                targets[key] = cache[key] = found.get(key)
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        return targets
@@ -1,21 +1,30 @@
+import re
 import string
 from itertools import chain, zip_longest
+from typing import Iterator, NamedTuple
 
 from razdel import tokenize
 
 # noinspection PyUnresolvedReferences
-import dicrector.textparse  # для регистрации символа ударения
-from dicrector.components import PatternRe, PatternWildcard, DictionaryIndex, ITextNode
-from dicrector.indexer import Wildcard
+import dicrector.tokenizers  # для регистрации символа ударения
+from dicrector.components import PatternRe, PatternWildcard, DictionaryIndex, ITextNode, Rule, fold_case, RE_INTERNALS
+from dicrector.indexer import Wildcard, INDEX_KEY_LENGTH
 
 WORD_DELIMITER = r'\b'
 PUNCTUATION = set(string.punctuation)
+# символы, после prepare_pattern не означающие в выражении сами себя, и пробельные символы кроме пробела
+REGEX_SPECIAL = re.compile(r'[\\^$|+()\[\]{}]|[^\S ]')
+# пробельные символы кроме пробела. В тексте приводятся к пробелу, как и \s выражения совпадает с любым из них
+OTHER_SPACES = re.compile(r'[^\S ]')
 
 
 class PatternDicx(PatternRe):
     def __init__(self, pattern: str, case_sensitive: bool):
         self.case_sensitive = case_sensitive
         self.key_pattern = self.find_key(pattern)
+        self.literals = self.find_literals(pattern, case_sensitive)
+        # шаблон без масок: выражение совпадает с фразой в любом месте текста, без границ слова
+        self.phrase = self.literals[0] if self.literals and '*' not in pattern else None
         pattern = self.prepare_pattern(pattern)
         super().__init__(pattern, case_sensitive)
 
@@ -29,6 +38,23 @@ class PatternDicx(PatternRe):
         key = min(patterns, key=lambda p: (p.wildcard.value, -1 * len(p.key)))
         return key
 
+    @staticmethod
+    def find_literals(pattern: str, case_sensitive: bool) -> tuple[str, ...] | None:
+        """Части шаблона между масками, которые обязательно есть в тексте при совпадении выражения. Без учета
+        регистра — в нижнем регистре, свернутые fold_case. None, если шаблон содержит символы выражений"""
+        if REGEX_SPECIAL.search(pattern) or not (case_sensitive or RE_INTERNALS):
+            return None  # без внутренних модулей re неизвестно, какие символы IGNORECASE считает равными
+        pt = PatternWildcard.from_str(pattern)
+        if pt.wildcard != Wildcard.none:
+            pattern = pt.key  # как в prepare_pattern
+        literals = tuple(part for part in pattern.split('*') if part)
+        if not case_sensitive:
+            folded = tuple(fold_case(part.lower()) for part in literals)
+            if any(len(a) != len(b) for a, b in zip(literals, folded)):
+                return None
+            literals = folded
+        return literals
+
     @staticmethod
     def prepare_pattern(pattern: str) -> str:
         pt = PatternWildcard.from_str(pattern)
@@ -53,16 +79,91 @@ class PatternDicx(PatternRe):
         return self.key_pattern.wildcard
 
 
+class IndexKey(NamedTuple):
+    key: str
+    wildcard: Wildcard
+    case_sensitive: bool
+
+
 class DictionaryDicx(DictionaryIndex):
     # Правила выбираются один раз. Цикл while может привести к зацикливанию, если ударение попадает на
     # последний символ. Недостаток одного прохода небольшой. Если применение предыдущего правило создаст ключ
     # поиска для одного из следующих, что почти невероятно.
+    @staticmethod
+    def _indexed(pattern: PatternDicx) -> PatternDicx | IndexKey:
+        """Все правила отбираются индексом. Ключевое слово без маски длиной от INDEX_KEY_LENGTH символов, как
+        в Indexer, отбирает правило по первым INDEX_KEY_LENGTH символам слова текста: выражение фразы без масок
+        не ограничено границами слов и совпадает и с началом более длинного слова"""
+        if pattern.wildcard == Wildcard.none and len(pattern.key) >= INDEX_KEY_LENGTH:
+            return IndexKey(pattern.key[:INDEX_KEY_LENGTH], Wildcard.right, pattern.case_sensitive)
+        return pattern
+
+    def candidates(self, node: ITextNode) -> list[int]:
+        words_rules_idx = (self._candidates(word_node.normalized()) for word_node in node.childs)
+        return sorted(set(chain.from_iterable(words_rules_idx)))
+
+    def rejects(self, node: ITextNode) -> bool:
+        """Фильтр индекса отбросил все слова предложения"""
+        return self._index is not None and all(self._index.rejects(word_node.normalized())
+                                               for word_node in node.childs)
+
     def rules_for(self, node: ITextNode):
-        # noinspection PyUnresolvedReferences
-        words_rules_idx = (self._index[word_node.text] for word_node in node.childs)
-        rules_idx = sorted(set(chain.from_iterable(words_rules_idx)))
-        rules = (self.rules[i] for i in rules_idx)
-        return (rule for rule in rules if rule.pattern.match(node.text))
+        return (rule for rule, _ in self._matches(node))
+
+    def apply(self, node: ITextNode):
+        for rule, positions in self._matches(node):
+            if positions:
+                node.text = self._replaced(node.text, positions, len(rule.pattern.phrase), rule.target)
+            else:
+                rule.apply(node)
+
+    def _matches(self, node: ITextNode) -> Iterator[tuple[Rule, list[int] | None]]:
+        """Совпавшие с текстом ноды правила-кандидаты. Сначала в тексте ищутся части шаблона без масок (поиск
+        подстроки быстрее выражения), правило без них пропускается. Для шаблона без масок и замены без ссылок на
+        группы возвращаются и позиции найденных фраз — замена по ним дает тот же текст, что и выражение"""
+        rules = self.rules
+        text = folded = exact = None
+        for i in self.candidates(node):
+            rule = rules[i]
+            pattern = rule.pattern
+            literals = pattern.literals
+            if literals is not None:
+                if node.text != text:
+                    text = node.text
+                    exact = OTHER_SPACES.sub(' ', text)
+                    folded = fold_case(OTHER_SPACES.sub(' ', node.normalized()))
+                    if len(folded) != len(text):  # позиции в тексте и в его нижнем регистре разные
+                        folded = None
+                source = exact if pattern.case_sensitive else folded
+                if source is not None:
+                    if not all(map(source.__contains__, literals)):
+                        continue
+                    if pattern.phrase and '\\' not in rule.target:
+                        yield rule, self._positions(source, pattern.phrase)
+                        continue
+            if pattern.match(node.text):
+                yield rule, None
+
+    @staticmethod
+    def _positions(source: str, phrase: str) -> list[int]:
+        """Начала непересекающихся вхождений фразы слева направо, как их находит выражение"""
+        positions = []
+        position = source.find(phrase)
+        while position >= 0:
+            positions.append(position)
+            position = source.find(phrase, position + len(phrase))
+        return positions
+
+    @staticmethod
+    def _replaced(text: str, positions: list[int], length: int, target: str) -> str:
+        parts = []
+        stop = 0
+        for start in positions:
+            parts.append(text[stop:start])
+            parts.append(target)
+            stop = start + length
+        parts.append(text[stop:])
+        return ''.join(parts)
 
 
 # noinspection PyUnusedLocal
@@ -1,4 +1,4 @@
-from dicrector.components import Depends, ProcessLevel, Dictionary, RuleResolved, PatternFake
+from dicrector.components import Depends, ProcessLevel, DictionaryBatch, RuleResolved, PatternFake
 from dicrector.loaders import Loader, LoadDepends
 from dicrector.formats.extw import prepare_fake_rule, target_maker
 
@@ -9,7 +9,7 @@ depends = Depends(
         Loader.single,
         prepare_fake_rule,
     ),
-    dict_maker=Dictionary.load,
+    dict_maker=DictionaryBatch.load,
     rule_maker=RuleResolved.from_,
     pattern_maker=PatternFake,
     target_maker=target_maker
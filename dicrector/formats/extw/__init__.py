@@ -1,4 +1,7 @@
-from dicrector.components import Depends, ProcessLevel, Dictionary, RuleResolved, PatternFake
+from inspect import iscoroutinefunction
+
+from dicrector.components import Depends, ProcessLevel, DictionaryBatch, RuleResolved, PatternFake, ResolverBatch, \
+    awaited
 from dicrector.loaders import Loader, LoadDepends
 
 
@@ -9,8 +12,17 @@ def prepare_fake_rule(data):
 
 # noinspection PyUnusedLocal
 def target_maker(target: tuple, side_module):
+    # corrector(node) -> str|None обрабатывает одну ноду, corrector_batch(nodes) -> list[str|None] — все ноды
+    # строки сразу. Достаточно одной из функций. Функции могут быть асинхронными (async def)
     module = side_module()
-    target = getattr(module, 'corrector')
+    target = getattr(module, 'corrector', None)
+    batch = getattr(module, 'corrector_batch', None)
+    if iscoroutinefunction(target):
+        target = awaited(target)
+    if iscoroutinefunction(batch):
+        batch = awaited(batch)
+    if batch is not None:
+        target = ResolverBatch(batch, target)
     return target
 
 
@@ -20,7 +32,7 @@ depends = Depends(
         Loader.single,
         prepare_fake_rule,
     ),
-    dict_maker=Dictionary.load,
+    dict_maker=DictionaryBatch.load,
     rule_maker=RuleResolved.from_,
     pattern_maker=PatternFake,
     target_maker=target_maker
@@ -1,4 +1,4 @@
-from dicrector.components import Depends, ProcessLevel, Dictionary, Rule, PatternRe
+from dicrector.components import Depends, ProcessLevel, DictionaryRe, Rule, PatternRe
 from dicrector.loaders import textfile_dictionary
 
 
@@ -16,7 +16,7 @@ def parse_target(target: tuple, side_module):
 depends = Depends(
     ProcessLevel.line,
     textfile_dictionary,
-    dict_maker = Dictionary.load,
+    dict_maker = DictionaryRe.load,
     rule_maker=Rule.from_,
     pattern_maker=PatternRe.from_str,
     target_maker=parse_target
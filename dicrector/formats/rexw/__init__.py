@@ -1,12 +1,13 @@
-from dicrector.components import Depends, ProcessLevel, Dictionary, Rule, PatternRe
+from dicrector.components import Depends, ProcessLevel, DictionaryRe, Rule, PatternRe
 from dicrector.loaders import textfile_dictionary
 from dicrector.formats.rex import parse_target
 
 depends = Depends(
     ProcessLevel.word,
     textfile_dictionary,
-    dict_maker=Dictionary.load,
+    dict_maker=DictionaryRe.load,
     rule_maker=Rule.from_,
     pattern_maker=PatternRe.from_str,
-    target_maker=parse_target
+    target_maker=parse_target,
+    options={'joined_scan': True}
 )
@@ -1,7 +1,10 @@
-from collections import defaultdict
+from array import array
+from collections import defaultdict, deque
+from copy import copy
 from enum import Enum
 from functools import lru_cache
-from typing import List, Protocol, Iterable
+from itertools import chain
+from typing import List, Protocol, Iterable, Sequence
 
 
 INDEX_KEY_LENGTH = 8  # Индекс по первым N символам токена. Оптимально 7-9
@@ -20,21 +23,105 @@ class IIndexed(Protocol):
     key: str
 
 
+class RejectFilter:
+    """Отбраковка текста, к которому заведомо не подходит ни один ключ индекса, без обхода самого индекса:
+    текст короче самого короткого ключа; не начинающийся с начала ключа без маски или с маской справа и не
+    оканчивающийся концом ключа с маской слева; при ключах с масками с двух сторон — без единого символа ключей.
+    Начала и концы — первые и последние HEAD_LENGTH символов ключа, ключ короче хранится целиком.
+
+    Вместо битового фильтра Блума — множества коротких строк: их размер ограничен квадратом алфавита, проверка
+    выполняется в C, а хеш строк в Python зависит от процесса, и битовая маска из кеша словаря (pickle) была бы
+    неверна в другом процессе. Фильтр пропускает лишнее, но никогда не отбрасывает подходящий текст"""
+    HEAD_LENGTH = 2
+
+    def __init__(self):
+        self.min_length = None
+        self._heads = set()  # начала ключей без маски и с маской справа
+        self._tails = set()  # концы ключей с маской слева
+        self._alphabet = set()
+        self._infix = False
+        self._short_heads = self._short_tails = False
+
+    def add(self, key: str, wildcard: Wildcard):
+        """key — ключ в нижнем регистре, как в индексе"""
+        if not key:  # правило '*' по индексу недостижимо
+            return
+        self.min_length = len(key) if self.min_length is None else min(self.min_length, len(key))
+        self._alphabet.update(key)
+        short = len(key) < self.HEAD_LENGTH
+        if wildcard == Wildcard.both:
+            self._infix = True
+        elif wildcard == Wildcard.left:
+            self._tails.add(key[-self.HEAD_LENGTH:])
+            self._short_tails |= short
+        else:
+            self._heads.add(key[:self.HEAD_LENGTH])
+            self._short_heads |= short
+
+    def freeze(self):
+        self._heads, self._tails, self._alphabet = map(frozenset, (self._heads, self._tails, self._alphabet))
+
+    def extended(self, keys: Iterable[tuple[str, Wildcard]]) -> 'RejectFilter':
+        """Копия фильтра с добавленными ключами. Ключи удаленных правил остаются — фильтр лишь пропускает больше"""
+        extended = copy(self)
+        extended._heads, extended._tails, extended._alphabet = set(self._heads), set(self._tails), set(self._alphabet)
+        for key, wildcard in keys:
+            extended.add(key, wildcard)
+        extended.freeze()
+        return extended
+
+    def rejects(self, string: str) -> bool:
+        """string — в нижнем регистре"""
+        if self.min_length is None or len(string) < self.min_length:
+            return True
+        if self._infix:
+            return self._alphabet.isdisjoint(string)
+        head_length = self.HEAD_LENGTH
+        if string[:head_length] in self._heads or string[-head_length:] in self._tails:
+            return False
+        if self._short_heads and string[0] in self._heads or self._short_tails and string[-1] in self._tails:
+            return False
+        return True
+
+
+def _lower_key(pattern: IIndexed) -> str:
+    return pattern.key.lower() if pattern.case_sensitive else pattern.key
+
+
 class Indexer:
     def __init__(self, key_length: int=INDEX_KEY_LENGTH):
         self._index = {w: defaultdict(list) for w in Wildcard}
         self._key_length = key_length
         self._index_minsize = None
+        self._offsets = self._postings = None
+        self._filter = RejectFilter()
 
     def freeze(self):
         """Замораживаем индекс для работы. Процедура однократная. При повторном использовании будет выброшено
         исключение."""
         if self._index_minsize is None:
             self._index_minsize = {wc: min(map(len, index)) for wc, index in self._index.items() if index}
+            self._pack()
+            self._filter.freeze()
         else:
-            raise  # TODO кастомизировать исключение
+            raise RuntimeError('индекс уже заморожен')
 
-    def add(self, pattern: IIndexed, order_no: int):
+    def _pack(self):
+        """Списки номеров правил заменяются одним массивом postings: ключ отображается в номер ячейки i, ее правила
+        — postings[offsets[i]:offsets[i + 1]], по возрастанию. На больших словарях в разы экономнее списков
+        из объектов int"""
+        offsets = array('I', [0])
+        postings = array('I')
+        for wildcard, sub_index in self._index.items():
+            slots = {}
+            for key, values in sub_index.items():
+                slots[key] = len(offsets) - 1
+                postings.extend(sorted(values))
+                offsets.append(len(postings))
+            self._index[wildcard] = slots
+        self._offsets, self._postings = offsets, postings
+
+    def _key(self, pattern: IIndexed) -> str:
         # ограничиваем длину ключа
         if pattern.wildcard == Wildcard.left:
             key = pattern.key[-self._key_length:]
@@ -44,8 +131,40 @@ class Indexer:
         # поэтому индексируем в нижнем регистре.
         if pattern.case_sensitive:  # Для not case_sensitive шаблона, регистр уже преобразован
             key = key.lower()
+        return key
+
+    def add(self, pattern: IIndexed, order_no: int):
         sub_index = self._index[pattern.wildcard]
-        sub_index[key].append(order_no)
+        sub_index[self._key(pattern)].append(order_no)
+        self._filter.add(_lower_key(pattern), pattern.wildcard)
+
+    def update(self, remap: Sequence[int], added: Iterable[tuple[IIndexed, int]]):
+        """Изменение замороженного индекса при перезагрузке словаря. Номера правил заменяются по remap (старый
+        номер: новый, -1 — правило удалено), добавляются правила added. Массивы и словари ячеек заменяются
+        новыми, поэтому копия индекса (copy.copy), сделанная до изменения, остается рабочей"""
+        offsets, postings = self._offsets, self._postings
+        values = [[new for old in postings[offsets[slot]:offsets[slot + 1]] if (new := remap[old]) >= 0]
+                  for slot in range(len(offsets) - 1)]
+        index = {wildcard: dict(slots) for wildcard, slots in self._index.items()}
+        added = list(added)
+        self._filter = self._filter.extended((_lower_key(pattern), pattern.wildcard) for pattern, _ in added)
+        for pattern, order_no in added:
+            slots = index[pattern.wildcard]
+            key = self._key(pattern)
+            slot = slots.get(key)
+            if slot is None:
+                slot = slots[key] = len(values)
+                values.append([])
+            values[slot].append(order_no)
+
+        offsets = array('I', [0])
+        postings = array('I')
+        for slot_values in values:
+            postings.extend(sorted(slot_values))
+            offsets.append(len(postings))
+        self._index, self._offsets, self._postings = index, offsets, postings
+        self._index_minsize = {wc: min(map(len, slots)) for wc, slots in index.items() if slots}
+        self._slice_permutation.cache_clear()  # срезы зависят от минимальной длины ключей
 
     @lru_cache
     def _slice_permutation(self, string_length: int) -> list[tuple[slice, Iterable[Wildcard]]]:
@@ -73,13 +192,157 @@ class Indexer:
         return permutation
 
     def __getitem__(self, string: str) -> List[int]:
-        order_no = set()
-        string = string.lower()
-        length = len(string)
-        for slice_, mask in self._slice_permutation(length):
+        return self.find(string.lower())
+
+    def rejects(self, string: str) -> bool:
+        """Ни один ключ индекса не подходит к тексту в нижнем регистре, см. RejectFilter"""
+        return self._filter.rejects(string)
+
+    def find(self, string: str) -> List[int]:
+        """Как index[string], для текста, уже приведенного к нижнему регистру"""
+        if self._filter.rejects(string):
+            return []
+        index = self._index
+        slots = []
+        for slice_, mask in self._slice_permutation(len(string)):
             key = string[slice_]
             for wildcard in mask:
-                index = self._index[wildcard]
-                if values := index.get(key):
-                    order_no.update(values)
-        return sorted(order_no)
+                slot = index[wildcard].get(key)
+                if slot is not None:
+                    slots.append(slot)
+        if not slots:
+            return []
+        offsets, postings = self._offsets, self._postings
+        if len(slots) == 1:
+            slot = slots[0]
+            return postings[offsets[slot]:offsets[slot + 1]].tolist()
+        # одна ячейка может найтись по нескольким срезам (маска *ключ*), после сортировки повторы идут подряд.
+        # Правило хранится только в одной ячейке, поэтому разные ячейки не пересекаются
+        slots.sort()
+        order_no = []
+        previous = -1
+        for slot in slots:
+            if slot != previous:
+                order_no += postings[offsets[slot]:offsets[slot + 1]]
+                previous = slot
+        order_no.sort()
+        return order_no
+
+
+class AutomatonIndexer:
+    """Индекс на автоматах. Все кандидаты находятся за один проход по слову: правила без маски — по словарю,
+    с маской справа (слов*) — по префиксному дереву, с маской слева (*слов) — по дереву перевернутых ключей,
+    с масками с двух сторон (*слов*) — автоматом Ахо-Корасик. Ключ не ограничивается по длине, поэтому лишних
+    кандидатов, отбрасываемых проверкой шаблона, меньше, чем у Indexer."""
+    def __init__(self):
+        self._exact = defaultdict(list)
+        self._prefix = {}  # узел дерева — словарь символ: узел, номера правил хранятся по ключу None
+        self._suffix = {}
+        self._infix = {}  # ключ: номера правил, до заморозки
+        self._goto = self._fail = self._out = None
+        self._filter = RejectFilter()
+
+    def freeze(self):
+        """Замораживаем индекс для работы, строится автомат Ахо-Корасик. Процедура однократная. При повторном
+        использовании будет выброшено исключение."""
+        if self._goto is None:
+            self._build_automaton()
+            self._filter.freeze()
+        else:
+            raise RuntimeError('индекс уже заморожен')
+
+    def add(self, pattern: IIndexed, order_no: int):
+        key = pattern.key
+        if not key:  # правило '*' по индексу недостижимо, как и в Indexer
+            return
+        if pattern.case_sensitive:  # Для not case_sensitive шаблона, регистр уже преобразован
+            key = key.lower()
+        wildcard = pattern.wildcard
+        self._filter.add(key, wildcard)
+        if wildcard == Wildcard.none:
+            self._exact[key].append(order_no)
+        elif wildcard == Wildcard.both:
+            self._infix.setdefault(key, []).append(order_no)
+        else:
+            if wildcard == Wildcard.left:
+                node, key = self._suffix, key[::-1]
+            else:
+                node = self._prefix
+            for char in key:
+                node = node.setdefault(char, {})
+            node.setdefault(None, []).append(order_no)
+
+    def _build_automaton(self):
+        goto = [{}]
+        out = [()]
+        for key, values in self._infix.items():
+            state = 0
+            for char in key:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = goto[state][char] = len(goto)
+                    goto.append({})
+                    out.append(())
+                state = next_state
+            out[state] = tuple(values)
+
+        # ссылки неудач строятся обходом в ширину, выходы состояния дополняются выходами его ссылки неудачи
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                link = fail[state]
+                while link and char not in goto[link]:
+                    link = fail[link]
+                link = goto[link].get(char, 0)
+                fail[next_state] = link if link != next_state else 0
+                out[next_state] += out[fail[next_state]]
+        self._goto, self._fail, self._out = goto, fail, out
+        self._infix = None
+
+    @staticmethod
+    def _walk(node: dict, chars: Iterable[str], found: list):
+        for char in chars:
+            node = node.get(char)
+            if node is None:
+                break
+            if values := node.get(None):
+                found.append(values)
+
+    def __getitem__(self, string: str) -> List[int]:
+        return self.find(string.lower())
+
+    def rejects(self, string: str) -> bool:
+        """Ни один ключ индекса не подходит к тексту в нижнем регистре, см. RejectFilter. При ключах с масками
+        с двух сторон фильтр не применяется: проход автомата по тексту не дороже проверки фильтра"""
+        return len(self._goto) == 1 and self._filter.rejects(string)
+
+    def find(self, string: str) -> List[int]:
+        """Как index[string], для текста, уже приведенного к нижнему регистру"""
+        goto = self._goto
+        if len(goto) == 1 and self._filter.rejects(string):
+            return []
+        found = []
+        if values := self._exact.get(string):
+            found.append(values)
+        if self._prefix:
+            self._walk(self._prefix, string, found)
+        if self._suffix:
+            self._walk(self._suffix, reversed(string), found)
+        if len(goto) > 1:
+            fail, out = self._fail, self._out
+            state = 0
+            for char in string:
+                while state and char not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(char, 0)
+                if values := out[state]:
+                    found.append(values)
+
+        if not found:
+            return []
+        if len(found) == 1:
+            return sorted(found[0])
+        return sorted(set(chain.from_iterable(found)))
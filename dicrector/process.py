@@ -1,22 +1,37 @@
+import gc
+import operator
+import os
+import pickle
 import sys
-from itertools import chain
+import threading
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import replace
+from itertools import chain, islice
 from pathlib import Path
-from typing import Iterable
+from time import perf_counter
+from typing import Callable, Iterable, Iterator, NamedTuple, TextIO
 
-from .components import ProcessLevel, Depends
-from .textparse import Line
+from . import textparse
+from .components import ProcessLevel, Depends, CachePolicy, BatchInfo, ResolverBatch, DictionaryIndex, MergedIndex
+from .indexer import Indexer
+from .shared import SharedDictionaries, SharedDictionaryIndex, attach
+from .textparse import Line, Token
 
 chain_iter = chain.from_iterable
 
 
 class Formats:
     items = {}
+    paths = {}  # пути модулей зарегистрированных форматов, для регистрации в дочерних процессах
 
     @classmethod
     def register(cls, module_path: Path):
         name = module_path.stem
         if name not in cls.items:
             cls.items[name] = module_path
+            cls.paths[name] = module_path
 
     @classmethod
     def register_all(cls, dir_path: Path):
@@ -48,38 +63,622 @@ class Formats:
         return depends
 
 
+EXECUTE_CHUNKSIZE = 256  # строк в одной задаче процесса-обработчика
+STREAM_READ_SIZE = 1 << 16  # символов, читаемых из потока за раз
+STREAM_LINE_LIMIT = 1 << 20  # строка длиннее делится на части по границе предложений
+
+
+TDictionaryName = str | Path | tuple[str | Path, dict]  # путь к словарю или (путь, параметры словаря)
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class WordChain:
+    """Последовательность словарей уровней word и part, применяемая к слову целиком. Результат запоминается
+    по тексту слова (и признаку первого слова, если этого требует политика одного из словарей), повторные
+    слова обрабатываются без обращения к словарям. Кеш ограничен maxsize слов, вытесняются давно не
+    использованные, maxsize=0 — без кеша. Идущие подряд словари DictionaryIndex с merge_index ищут кандидатов
+    по общему индексу (MergedIndex), один раз для каждого текста слова и его частей. Общие индексы merged
+    (из прежней цепочки) переиспользуются для тех же словарей, а не строятся заново."""
+    def __init__(self, dictionaries: list[tuple], maxsize: int, merged: Iterable[MergedIndex]=()):
+        self.dictionaries = dictionaries
+        self.first_word = any(dct.cache_policy == CachePolicy.first_word for dct, _ in dictionaries)
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self._cache = OrderedDict()
+        self._steps = self._merge(dictionaries, list(merged))
+
+    @property
+    def merged(self) -> list[MergedIndex]:
+        return list({id(dct): dct for dct, k, _ in self._steps if k is not None}.values())
+
+    @staticmethod
+    def _merge(dictionaries: list[tuple], merged: list[MergedIndex]) -> list[tuple]:
+        """Шаги применения (словарь, номер в MergedIndex или None, уровень)"""
+        steps = []
+        run = []
+        indexer = None  # класс индексов словарей run
+
+        def flush():
+            if len(run) > 1:
+                run_dictionaries = [dct for dct, _ in run]
+                index = next((index for index in merged if len(index.dictionaries) == len(run_dictionaries)
+                              and all(map(operator.is_, index.dictionaries, run_dictionaries))), None)
+                if index is None:
+                    index = MergedIndex(run_dictionaries, indexer or Indexer)
+                steps.extend((index, k, level) for k, (_, level) in enumerate(run))
+            else:
+                steps.extend((dct, None, level) for dct, level in run)
+            run.clear()
+
+        for dct, level in dictionaries:
+            if type(dct) is DictionaryIndex and dct.merge_index:
+                index_type = type(dct._index) if dct._index is not None else None  # без правил с маской — любой
+                # общий индекс — по одинаково нормализованному тексту, того же класса, что индексы словарей
+                if run and (run[0][0].fold_yo != dct.fold_yo or indexer and index_type and indexer is not index_type):
+                    flush()
+                    indexer = None
+                run.append((dct, level))
+                indexer = indexer or index_type
+                continue
+            flush()
+            indexer = None
+            steps.append((dct, None, level))
+        flush()
+        return steps
+
+    def apply(self, word: Token):
+        if not self.maxsize:
+            self._apply(word)
+            return
+        key = (word.text, word.is_first_word) if self.first_word else word.text
+        cache = self._cache
+        text = cache.get(key)
+        if text is not None:
+            self.hits += 1
+            cache.move_to_end(key)
+            word.text = text
+            return
+
+        self.misses += 1
+        self._apply(word)
+        cache[key] = word.text
+        if len(cache) > self.maxsize:
+            cache.popitem(last=False)
+
+    def _apply(self, word: Token):
+        scans = None  # найденное в текущем MergedIndex, шаги которого идут подряд с k = 0
+        for dct, k, level in self._steps:
+            if k is None:
+                dct.apply(word)
+                if level == ProcessLevel.part:
+                    for part in word.childs:
+                        dct.apply(part)
+            else:
+                if not k:
+                    scans = {}
+                dct.apply(k, word, scans)
+                if level == ProcessLevel.part:
+                    for part in word.childs:
+                        dct.apply(k, part, scans)
+
+    def apply_batch(self, words: Iterable[Token]):
+        for word in words:
+            self.apply(word)
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._cache))
+
+    def cache_clear(self):
+        self._cache.clear()
+        self.hits = self.misses = 0
+
+
+class DictionaryStats(NamedTuple):
+    seconds: float  # время применения, включая разбор и сборку текста нод (parse_seconds, join_seconds)
+    nodes: int  # нод, к которым применялся словарь
+    rejected: int  # нод, для которых поиск по индексу пропущен фильтром индекса (rejects словаря)
+    candidates: int  # правил, отобранных индексом для проверки шаблоном (candidates словаря)
+    matched: int  # правил, шаблон которых совпал с текстом ноды до применения словаря
+    changed: int  # нод, текст которых изменен словарем
+    parse_seconds: float
+    join_seconds: float
+
+
+class ProfiledDictionary:
+    """Словарь со сбором статистики применения, см. Corrector(profile=True). Замеряется собственное применение
+    словаря (apply, apply_batch). Ноды и правила подсчитываются отдельными обращениями к индексу и шаблонам по
+    тексту ноды до применения словаря, время подсчета из замеров вычитается. У словарей с пакетной обработкой
+    (batched) правила применяются внутри словаря, поэтому кандидатами и совпадениями считаются все переданные ноды"""
+    def __init__(self, dictionary):
+        self.dictionary = dictionary
+        self.seconds = self.parse_seconds = self.join_seconds = 0.0
+        self.nodes = self.rejected = self.candidates = self.matched = self.changed = 0
+        self._counting = [0.0, 0.0, 0.0]  # время подсчета внутри текущего замера: общее, разбора, сборки текста
+
+    def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.dictionary, name)
+
+    def apply(self, node):
+        text = self._count(node)
+        self._timed(self.dictionary.apply, node)
+        self.changed += node.text != text
+
+    def apply_batch(self, nodes: Iterable):
+        texts = []
+
+        def counted():  # nodes ленивые: части слова разбираются после применения словаря к слову
+            for node in nodes:
+                texts.append((node, self._count(node)))
+                yield node
+
+        self._timed(self.dictionary.apply_batch, counted())
+        self.changed += sum(node.text != text for node, text in texts)
+
+    def _timed(self, apply: Callable, arg):
+        text_stats = textparse.stats or textparse.TextStats()  # вне execute_batch разбор не замеряется
+        parse_seconds, join_seconds = text_stats.parse_seconds, text_stats.join_seconds
+        counting = self._counting = [0.0, 0.0, 0.0]
+        start = perf_counter()
+        apply(arg)
+        self.seconds += perf_counter() - start - counting[0]
+        self.parse_seconds += text_stats.parse_seconds - parse_seconds - counting[1]
+        self.join_seconds += text_stats.join_seconds - join_seconds - counting[2]
+
+    def _count(self, node) -> str:
+        """Подсчет ноды и правил для нее. Возвращает текст ноды до применения словаря"""
+        text_stats = textparse.stats or textparse.TextStats()
+        parse_seconds, join_seconds = text_stats.parse_seconds, text_stats.join_seconds
+        start = perf_counter()
+        dictionary = self.dictionary
+        self.nodes += 1
+        if dictionary.batched:
+            self.candidates += 1
+            self.matched += 1
+        else:
+            self.rejected += dictionary.rejects(node)
+            self.candidates += len(dictionary.candidates(node))
+            self.matched += sum(1 for _ in dictionary.rules_for(node))  # без применения — все совпавшие с текстом
+        text = node.text
+        counting = self._counting
+        counting[0] += perf_counter() - start
+        counting[1] += text_stats.parse_seconds - parse_seconds
+        counting[2] += text_stats.join_seconds - join_seconds
+        return text
+
+    def stats(self) -> DictionaryStats:
+        return DictionaryStats(self.seconds, self.nodes, self.rejected, self.candidates, self.matched, self.changed,
+                               self.parse_seconds, self.join_seconds)
+
+
+@contextmanager
+def paused_gc():
+    """Сборка мусора на время создания множества долгоживущих объектов (правил словаря) только тратит время:
+    загрузка быстрее в полтора раза, восстановление из pickle — в два-три"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class LazyDictionary:
+    """Словарь, загружаемый при первом обращении к нему, например при первом применении в execute. Политика
+    кеширования и batched словаря с фиксированными заменами известны без загрузки (Depends.fixed_traits)"""
+    def __init__(self, name: TDictionaryName):
+        self.name = name
+        self._dictionary = None
+        path, depends = Corrector._depends(name)
+        self._traits = depends.fixed_traits(path)
+
+    @property
+    def loaded(self) -> bool:
+        return self._dictionary is not None
+
+    @property
+    def dictionary(self):
+        if self._dictionary is None:
+            self._dictionary, _ = Corrector._load(self.name)
+        return self._dictionary
+
+    @property
+    def cache_policy(self) -> CachePolicy:
+        if self._dictionary is None and self._traits is not None:
+            return self._traits[0]
+        return self.dictionary.cache_policy
+
+    @property
+    def batched(self) -> bool:
+        if self._dictionary is None and self._traits is not None:
+            return self._traits[1]
+        return self.dictionary.batched
+
+    def __getattr__(self, name: str):
+        if name.startswith('_'):  # в том числе при копировании, до инициализации полей
+            raise AttributeError(name)
+        return getattr(self.dictionary, name)
+
+
 class Corrector:
-    def __init__(self, dictionary_names: Iterable[str|Path]):
-        self.dictionaries = [self._load(name) for name in dictionary_names]
+    def __init__(self, dictionary_names: Iterable[TDictionaryName], word_cache: int=0, load_workers: int=1,
+                 lazy: bool=False, profile: bool=False, shared: dict[int, str | Path]=None):
+        """word_cache — размер кеша результатов обработки слов (см. WordChain), 0 — без кеширования.
+        load_workers — число процессов, загружающих словари одновременно. lazy — словарь загружается при первом
+        применении (см. LazyDictionary), load_workers при этом не используется. profile — сбор статистики
+        применения словарей и разбора текста (см. stats, text_stats), без него обработка ничем не замедляется.
+        shared — номер словаря: файл в общей памяти (SharedDictionaries.segments, см. share), такие словари
+        подключаются, а не загружаются"""
+        self.dictionary_names = list(dictionary_names)
+        self.word_cache = word_cache
+        self._stamps = [_stamp(self._depends(name)[0]) for name in self.dictionary_names]  # см. reload
+        self._lock = threading.Lock()
+        shared = shared or {}
+        if lazy:
+            self.dictionaries = [(attach(shared[i]) if i in shared else LazyDictionary(name),
+                                  self._depends(name)[1].level) for i, name in enumerate(self.dictionary_names)]
+        else:
+            self.dictionaries = self._load_all(self.dictionary_names, load_workers, shared)
+        self._text_stats = None
+        if profile:
+            self.dictionaries = [(ProfiledDictionary(dct), level) for dct, level in self.dictionaries]
+            self._text_stats = textparse.TextStats()
+        self._chain = None  # для ленивых словарей составляется при первом применении, см. _get_chain
+        if not lazy:
+            self._get_chain()
+
+    def _get_chain(self) -> list[tuple]:
+        if self._chain is None:
+            with self._lock:  # не затереть цепочку, составленную перезагрузкой
+                if self._chain is None:
+                    self._chain = self._make_chain(self.dictionaries, self.word_cache)
+        return self._chain
 
     @staticmethod
-    def _load(name: str|Path):  # -> tuple[Dictionary, ProcessLevel]
+    def _make_chain(dictionaries: list[tuple], word_cache: int, previous: list[tuple]=None) -> list[tuple]:
+        """Идущие подряд кешируемые словари уровней word и part объединяются в WordChain. Без кеша слов
+        в WordChain объединяются только идущие подряд словари DictionaryIndex с merge_index, ради общего индекса.
+        Общие индексы неизменившихся словарей берутся из прежней цепочки previous"""
+        chain_ = []
+        run = []
+        merged = [index for dct, _ in previous or () if isinstance(dct, WordChain) for index in dct.merged]
+
+        def merging(dct) -> bool:
+            return type(dct) is DictionaryIndex and dct.merge_index
+
+        def flush():
+            if word_cache or sum(merging(dct) for dct, _ in run) > 1:
+                chain_.append((WordChain(list(run), word_cache, merged), ProcessLevel.word))
+            else:
+                chain_.extend(run)
+            run.clear()
+
+        for dct, level in dictionaries:
+            if level in (ProcessLevel.word, ProcessLevel.part) and (
+                    dct.cache_policy != CachePolicy.none and not dct.batched  # пакетная обработка выгоднее кеша
+                    if word_cache else merging(dct)):
+                run.append((dct, level))
+                continue
+            if run:
+                flush()
+            chain_.append((dct, level))
+        if run:
+            flush()
+        return chain_
+
+    def reload(self, names: Iterable[TDictionaryName]=None, force: bool=False) -> list[str]:
+        """Перезагрузка словарей names (по умолчанию всех), файлы которых изменились после загрузки (по времени
+        изменения и размеру), с force — независимо от изменения. Словари без файла (extw, exts) перезагружаются
+        только с force. Индексные словари обновляются частично, см. DictionaryIndex.reload. Новые версии словарей
+        подготавливаются полностью, после чего цепочка заменяется одним присваиванием: выполняющиеся в это время
+        execute применяют старые словари, последующие — новые, смешения версий не бывает. Кеши слов и статистика
+        profile перезагруженных словарей сбрасываются.
+        Процессы-обработчики пула execute_iter продолжают работать со словарями, загруженными при их старте.
+        Возвращаются пути перезагруженных словарей"""
+        paths = None if names is None else {self._depends(name)[0] for name in names}
+        reloaded = []
+        with self._lock:
+            dictionaries = list(self.dictionaries)
+            for i, name in enumerate(self.dictionary_names):
+                path, depends = self._depends(name)
+                if paths is not None and path not in paths:
+                    continue
+                stamp = _stamp(path)
+                if not force and (stamp is None or stamp == self._stamps[i]):  # без файла — неизменен
+                    continue
+                dct, level = dictionaries[i]
+                dictionaries[i] = self._reload(dct, name, depends), level
+                self._stamps[i] = stamp
+                reloaded.append(str(path))
+            if reloaded:
+                self.dictionaries = dictionaries
+                self._chain = self._make_chain(dictionaries, self.word_cache, self._chain)
+        return reloaded
+
+    @classmethod
+    def _reload(cls, dct, name: TDictionaryName, depends: Depends):
+        if isinstance(dct, ProfiledDictionary):
+            return ProfiledDictionary(cls._reload(dct.dictionary, name, depends))
+        if isinstance(dct, LazyDictionary):
+            if not dct.loaded:
+                return LazyDictionary(name)
+            dct = dct.dictionary
+        with paused_gc():
+            if hasattr(dct, 'reload'):
+                return dct.reload(depends)
+            return depends.dict_maker(cls._depends(name)[0], depends)
+
+    def share(self, directory: str | Path=None) -> SharedDictionaries:
+        """Запись словарей dic в файлы в общей памяти (см. shared.py), в папке directory, по умолчанию /dev/shm.
+        Словари заменяются подключенными из файлов, процессы пула execute_iter и AsyncCorrector подключают их же.
+        Файлы удаляются SharedDictionaries.close, после чего новые процессы загружают словари сами"""
+        with self._lock:
+            dictionaries = [dct for dct, _ in self.dictionaries]
+            shared = SharedDictionaries(dictionaries, directory)
+            self.dictionaries = [(dct if i not in shared.segments or isinstance(dct, SharedDictionaryIndex)
+                                  else attach(shared.segments[i]), level)
+                                 for i, (dct, level) in enumerate(self.dictionaries)]
+            self._chain = self._make_chain(self.dictionaries, self.word_cache, self._chain)
+        return shared
+
+    def shared_segments(self) -> dict[int, Path]:
+        """Файлы словарей, подключенных из общей памяти, для параметра shared Corrector другого процесса"""
+        return {i: dct.segment_path for i, (dct, _) in enumerate(self.dictionaries)
+                if isinstance(dct, SharedDictionaryIndex) and dct.segment_path.exists()}
+
+    def cache_info(self) -> CacheInfo:
+        """Суммарная статистика кешей слов"""
+        infos = [dct.cache_info() for dct, _ in self._chain or () if isinstance(dct, WordChain) and dct.maxsize]
+        return CacheInfo(*map(sum, zip(*infos))) if infos else CacheInfo(0, 0, 0, 0)
+
+    def batch_info(self) -> dict[str, BatchInfo]:
+        """Статистика пакетных внешних обработчиков (ResolverBatch) по путям словарей. При обработке пулом
+        процессов статистика остается в процессах-обработчиках"""
+        return {str(dct.path): rule.target.batch_info()
+                for dct, _ in self.dictionaries if getattr(dct, 'loaded', True)
+                for rule in dct.rules if isinstance(rule.target, ResolverBatch)}
+
+    def stats(self) -> dict[str, DictionaryStats]:
+        """Статистика применения словарей по путям, для Corrector(profile=True). Словари, объединенные в WordChain,
+        применяются только к словам, которых нет в кеше. При обработке пулом процессов статистика остается
+        в процессах-обработчиках"""
+        return {str(self._depends(name)[0]): dct.stats()
+                for name, (dct, _) in zip(self.dictionary_names, self.dictionaries)
+                if isinstance(dct, ProfiledDictionary)}
+
+    def text_stats(self) -> textparse.TextStats | None:
+        """Суммарное время разбора и сборки текста, в том числе вне словарей, для Corrector(profile=True)"""
+        return self._text_stats
+
+    @staticmethod
+    def _depends(name: TDictionaryName) -> tuple[Path, Depends]:
+        name, options = name if isinstance(name, tuple) else (name, None)
         name = Path(name)
         format_ =  name.suffix[1:]
         depends = Formats.format(format_)
-        dictionary = depends.dict_maker(name, depends)
+        if options:  # параметры конкретного словаря дополняют параметры формата
+            depends = replace(depends, options=depends.options | options)
+        return name, depends
+
+    @classmethod
+    def _load(cls, name: TDictionaryName):  # -> tuple[Dictionary, ProcessLevel]
+        name, depends = cls._depends(name)
+        with paused_gc():
+            dictionary = depends.dict_maker(name, depends)
         return dictionary, depends.level
 
+    @classmethod
+    def _load_all(cls, names: list[TDictionaryName], load_workers: int, shared: dict[int, str | Path]=None
+                  ) -> list[tuple]:
+        """Загрузка словарей. При load_workers > 1 каждый словарь загружается в отдельном процессе и передается
+        сериализованным. Словари, которые невозможно сериализовать (с функциями сайд-модулей, соединениями
+        с базой, см. Depends.fixed_traits), загружаются в текущем процессе, пока остальные загружаются пулом.
+        Словари shared подключаются из общей памяти"""
+        if shared:
+            loaded = iter(cls._load_all([name for i, name in enumerate(names) if i not in shared], load_workers))
+            return [(attach(shared[i]), cls._depends(name)[1].level) if i in shared else next(loaded)
+                    for i, name in enumerate(names)]
+        if load_workers <= 1 or len(names) < 2:
+            return [cls._load(name) for name in names]
+        dictionaries = [None] * len(names)
+        pickled = {i for i, (path, depends) in enumerate(map(cls._depends, names))
+                   if (traits := depends.fixed_traits(path)) is not None and traits[2]}
+        if len(pickled) < 2:
+            return [cls._load(name) for name in names]
+        with ProcessPoolExecutor(min(load_workers, len(pickled)), initializer=_register_formats,
+                                 initargs=(dict(Formats.paths),)) as pool:
+            futures = {pool.submit(_load_pickled, names[i]): i for i in pickled}
+            for i, name in enumerate(names):
+                if i not in pickled:
+                    dictionaries[i] = cls._load(name)
+            for future in as_completed(futures):  # восстанавливаются по мере готовности, пока грузятся остальные
+                i = futures[future]
+                data, level = future.result()
+                if data is not None:
+                    try:
+                        with paused_gc():
+                            dictionaries[i] = pickle.loads(data), level
+                    except (pickle.UnpicklingError, AttributeError, ImportError):
+                        pass
+        return [dct or cls._load(name) for dct, name in zip(dictionaries, names)]
+
     def execute(self, line: str) -> str:
-        # ВНИМАНИЕ: метод при разбиении на предложения и обратной сборке, теряет linefeed ('\n')
-        line = Line.from_str(line)
-        for dct, level in self.dictionaries:
+        # ВНИМАНИЕ: пробельные символы в начале и конце строки при изменении текста теряются, поэтому документ
+        # обрабатывается построчно, см. execute_stream
+        return self.execute_batch([line])[0]
+
+    def execute_batch(self, lines: list[str]) -> list[str]:
+        """Обработка набора строк в текущем процессе. Каждый словарь применяется сразу ко всем строкам, так внешние
+        обработчики с пакетной функцией (см. ResolverBatch) получают ноды всех строк одним вызовом"""
+        if self._text_stats is None:
+            return self._execute_batch(lines)
+        previous, textparse.stats = textparse.stats, self._text_stats
+        try:
+            return self._execute_batch(lines)
+        finally:
+            textparse.stats = previous
+
+    def _execute_batch(self, lines: list[str]) -> list[str]:
+        lines = [Line.from_str(line) for line in lines]
+        for dct, level in self._get_chain():
             if level == ProcessLevel.line:
-                tokens = (line,)
+                tokens = lines
             elif level == ProcessLevel.sent:
-                tokens = line.childs
+                tokens = tuple(chain_iter(line.childs for line in lines))
             else:  # уровень part дополнительно обрабатывается как word (word+part)
-                words = (s.childs for s in line.childs)
+                words = (s.childs for line in lines for s in line.childs)
                 words = tuple(chain_iter(words))
                 tokens = words
                 if level == ProcessLevel.part:
                     parts = chain_iter(w.childs for w in words)
                     tokens = chain(words, parts)
 
-            for t in tokens:
-                dct.apply(t)
+            dct.apply_batch(tokens)
+
+        return [line.text for line in lines]
+
+    def execute_many(self, lines: Iterable[str], workers: int=None, chunksize: int=EXECUTE_CHUNKSIZE) -> list[str]:
+        """Обработка набора строк пулом процессов. Результаты возвращаются в порядке исходных строк"""
+        return list(self.execute_iter(lines, workers, chunksize))
+
+    def execute_iter(self, lines: Iterable[str], workers: int=None,
+                     chunksize: int=EXECUTE_CHUNKSIZE) -> Iterator[str]:
+        """Потоковый вариант execute_many. Строки читаются из lines по мере обработки, в работе одновременно
+        находится не более двух пакетов на процесс, поэтому потребление памяти не зависит от объема данных.
+        Каждый процесс загружает словари однократно, при старте. workers=None — по числу процессоров,
+        workers=1 — обработка в текущем процессе без создания пула."""
+        if workers is None:
+            workers = os.cpu_count() or 1
+        lines = iter(lines)
+        chunks = iter(lambda: list(islice(lines, chunksize)), [])
+        if workers <= 1:
+            yield from chain_iter(map(self.execute_batch, chunks))
+            return
+
+        pool = ProcessPoolExecutor(workers, initializer=_init_worker,
+                                   initargs=(self.dictionary_names, dict(Formats.paths), self.word_cache,
+                                             textparse.tokenizer, self.shared_segments()))
+        try:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(_execute_chunk, chunk))
+                if len(pending) >= workers * 2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    def execute_stream(self, source: TextIO | Iterable[str], output: TextIO = None, workers: int=1,
+                       chunksize: int=EXECUTE_CHUNKSIZE) -> Iterator[str] | None:
+        """Обработка документа. source — текстовый файл, читаемый частями по STREAM_READ_SIZE символов, или
+        последовательность фрагментов текста произвольной длины. Текст делится на строки по '\n', каждая
+        обрабатывается execute, а окончания строк и пробельные символы по краям переносятся в результат без
+        изменений (для сохранения '\r\n' файл открывается с newline=''). Строка длиннее STREAM_LINE_LIMIT
+        делится по границе предложений, поэтому память не зависит от объема документа.
+        Без output возвращается итератор обработанных строк, с output — результат записывается в него.
+        workers и chunksize — как в execute_iter."""
+        if hasattr(source, 'read'):
+            file = source
+            source = iter(lambda: file.read(STREAM_READ_SIZE), '')
+        results = self._stream(source, workers, chunksize)
+        if output is None:
+            return results
+        output.writelines(results)
+
+    def _stream(self, chunks: Iterable[str], workers: int, chunksize: int) -> Iterator[str]:
+        edges = deque()  # (начало, есть ли текст, конец) строк, отданных на обработку
+
+        def texts():
+            for line in _split_lines(chunks, STREAM_LINE_LIMIT):
+                text = line.strip()
+                head = line[:len(line) - len(line.lstrip())]
+                edges.append((head, bool(text), line[len(head) + len(text):]))
+                if text:  # строки из одних пробельных символов не обрабатываются
+                    yield text
+
+        for result in self.execute_iter(texts(), workers, chunksize):
+            head, has_text, tail = edges.popleft()
+            while not has_text:
+                yield head + tail
+                head, has_text, tail = edges.popleft()
+            yield head + result + tail
+        for head, _, tail in edges:
+            yield head + tail
+
+
+def _stamp(path: Path) -> tuple[int, int] | None:
+    """Время изменения и размер файла словаря. None — файла нет (словари extw, exts состоят из модуля функций)"""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _split_lines(chunks: Iterable[str], line_limit: int) -> Iterator[str]:
+    """Строки потока фрагментов текста, вместе с '\n'"""
+    rest = ''
+    for chunk in chunks:
+        lines = (rest + chunk).split('\n')
+        rest = lines.pop()
+        for line in lines:
+            yield line + '\n'
+        while len(rest) > line_limit:
+            cut = _sentence_cut(rest)
+            yield rest[:cut]
+            rest = rest[cut:]
+    if rest:
+        yield rest
+
+
+def _sentence_cut(text: str) -> int:
+    """Позиция начала последнего предложения текста, разбирается только конец текста. Если предложений меньше
+    двух — позиция после последнего пробела, если нет и его — весь текст"""
+    offset = max(len(text) - STREAM_READ_SIZE, 0)
+    starts = [s.start for s in textparse.tokenizer.sentenize(text[offset:])]
+    if len(starts) > 1:  # первое предложение окна может быть обрезано
+        return offset + starts[-1]
+    cut = text.rfind(' ') + 1
+    return cut or len(text)
+
+
+# ========== Процессы-обработчики execute_many =========================================
+_worker_corrector: Corrector|None = None
+
+
+def _register_formats(format_paths: dict[str, Path]):
+    for module_path in format_paths.values():  # пользовательские форматы, при старте процесса методом spawn
+        Formats.register(module_path)
+
+
+def _init_worker(dictionary_names: list[TDictionaryName], format_paths: dict[str, Path], word_cache: int,
+                 tokenizer: textparse.ITokenizer, shared: dict[int, Path]=None):
+    global _worker_corrector
+    _register_formats(format_paths)
+    textparse.set_tokenizer(tokenizer)
+    _worker_corrector = Corrector(dictionary_names, word_cache, shared=shared)
+
+
+def _execute_chunk(lines: list[str]) -> list[str]:
+    return _worker_corrector.execute_batch(lines)
+
 
-        return line.text
+def _load_pickled(name: TDictionaryName) -> tuple[bytes | None, ProcessLevel]:
+    """Загрузка словаря процессом Corrector._load_all. None — словарь не сериализуется"""
+    dictionary, level = Corrector._load(name)
+    try:
+        return pickle.dumps(dictionary, protocol=pickle.HIGHEST_PROTOCOL), level
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return None, level
 
 
 Formats.register_default()
@@ -0,0 +1,372 @@
+"""Локальный сервер обработки строк, разделяющий словари между процессами.
+
+    python -m dicrector.serve --dicts словарь1.dic словарь2.dicx --socket /run/dicrector.sock --workers 4
+    python -m dicrector.serve --dicts словарь1.dic --tcp 127.0.0.1:8765
+
+Словари загружаются один раз, родительским процессом, после чего запускаются workers процессов-обработчиков
+(os.fork). Страницы памяти со словарями остаются общими, пока их не изменит один из процессов (copy-on-write).
+Перед запуском объекты словарей убираются из-под наблюдения сборщика мусора (gc.freeze), иначе его обходы
+записывали бы в заголовки объектов и копировали страницы в каждый процесс. Счетчики ссылок объектов, к которым
+обращается обработка, по-прежнему изменяются, поэтому общей остается основная часть словаря — не задействованные
+текстом правила. Завершившийся процесс-обработчик перезапускается. Если процессы-обработчики завершаются с ошибкой
+вскоре после запуска, перезапуск откладывается (RESPAWN_DELAY, вдвое дольше с каждой ошибкой подряд), а после
+RESPAWN_LIMIT таких ошибок подряд сервер останавливается.
+
+Протокол: сообщение — длина (4 байта, big-endian) и текст UTF-8. На каждую строку запроса сервер отвечает
+сообщением, первый байт которого — признак успеха (0) или ошибки (1), остальное — результат или текст ошибки.
+Ответы идут в порядке запросов, клиент может отправить несколько запросов, не дожидаясь ответов (pipelining),
+полученные вместе запросы обрабатываются одним execute_batch. Пока клиент не читает ответы, а их накопилось больше
+WORKER_OUTPUT_LIMIT байт, сервер не читает его запросы, поэтому клиент, отправляющий запросы пачкой, должен читать
+ответы во время отправки (см. CorrectorClient)."""
+import argparse
+import gc
+import os
+import selectors
+import signal
+import socket
+import struct
+import sys
+import time
+import traceback
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from .process import Corrector
+
+HEADER = struct.Struct('>I')
+OK, ERROR = 0, 1
+RECV_SIZE = 1 << 16
+SERVE_BATCH_LIMIT = 256  # строк, обрабатываемых одним execute_batch
+CLIENT_WINDOW = 64  # запросов клиента, отправленных без ожидания ответа
+WORKER_OUTPUT_LIMIT = 1 << 20  # байт неотправленных ответов соединения, после которых его запросы не читаются
+RESPAWN_FAST = 5.0  # секунд работы процесса-обработчика, завершение с ошибкой до которых считается сбоем запуска
+RESPAWN_DELAY = 0.1  # секунд до перезапуска после первого сбоя запуска подряд
+RESPAWN_DELAY_MAX = 10.0
+RESPAWN_LIMIT = 10  # сбоев запуска подряд, после которых сервер останавливается
+
+TAddress = str | Path | tuple[str, int]  # путь сокета Unix или (хост, порт)
+
+
+def encode(payload: bytes) -> bytes:
+    return HEADER.pack(len(payload)) + payload
+
+
+def decode(buffer: bytearray) -> list[bytes]:
+    """Полностью полученные сообщения, извлекаемые из начала buffer"""
+    messages = []
+    position = 0
+    while len(buffer) - position >= HEADER.size:
+        size, = HEADER.unpack_from(buffer, position)
+        stop = position + HEADER.size + size
+        if stop > len(buffer):
+            break
+        messages.append(bytes(buffer[position + HEADER.size:stop]))
+        position = stop
+    del buffer[:position]
+    return messages
+
+
+def tcp_address(text: str) -> tuple[str, int]:
+    """'хост:порт', адрес IPv6 — в квадратных скобках"""
+    host, _, port = text.rpartition(':')
+    return host.strip('[]'), int(port)
+
+
+def _socket(address: TAddress) -> socket.socket:
+    family = socket.AF_INET6 if isinstance(address, tuple) and ':' in address[0] else socket.AF_INET
+    return socket.socket(socket.AF_UNIX if isinstance(address, (str, Path)) else family, socket.SOCK_STREAM)
+
+
+def listen(address: TAddress, backlog: int=128) -> socket.socket:
+    listener = _socket(address)
+    if isinstance(address, (str, Path)):
+        Path(address).unlink(missing_ok=True)
+        listener.bind(str(address))
+    else:
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind(address)
+    listener.listen(backlog)
+    return listener
+
+
+# ========== Сервер ===================================================================
+class Server:
+    """Процесс-родитель: загрузка словарей, запуск и перезапуск процессов-обработчиков"""
+    def __init__(self, corrector: Corrector, address: TAddress, workers: int):
+        if not hasattr(os, 'fork'):
+            raise OSError('Сервер требует os.fork (Linux, macOS)')
+        self.corrector = corrector
+        self.address = address
+        self.workers = workers
+        self._children: dict[int, float] = {}  # pid: время запуска
+        self._failures = 0  # сбоев запуска подряд
+        self._stopping = False
+
+    def serve_forever(self):
+        listener = listen(self.address)
+        previous = {sig: signal.signal(sig, self._stop) for sig in (signal.SIGTERM, signal.SIGINT)}
+        gc.collect()
+        gc.freeze()  # все объекты словарей — в постоянное поколение, сборщик мусора их больше не обходит
+        try:
+            for _ in range(self.workers):
+                self._spawn(listener)
+            while self._children:
+                try:
+                    pid, status = os.wait()
+                except ChildProcessError:
+                    break
+                except InterruptedError:
+                    continue
+                started = self._children.pop(pid, None)
+                if self._stopping:
+                    continue
+                if started is not None and os.waitstatus_to_exitcode(status) != 0 \
+                        and time.monotonic() - started < RESPAWN_FAST:
+                    self._failures += 1
+                    if self._failures >= RESPAWN_LIMIT:
+                        raise RuntimeError(f'Процессы-обработчики завершились с ошибкой {self._failures} раз подряд '
+                                           f'сразу после запуска')
+                    time.sleep(min(RESPAWN_DELAY * 2 ** (self._failures - 1), RESPAWN_DELAY_MAX))
+                    if self._stopping:
+                        continue
+                else:
+                    self._failures = 0
+                self._spawn(listener)
+        finally:
+            self._terminate()
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+            listener.close()
+            if isinstance(self.address, (str, Path)):
+                Path(self.address).unlink(missing_ok=True)
+
+    def _spawn(self, listener: socket.socket):
+        pid = os.fork()
+        if pid:
+            self._children[pid] = time.monotonic()
+            return
+        code = 0
+        try:
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(sig, signal.SIG_DFL)
+            Worker(self.corrector, listener).run()
+        except BaseException:
+            code = 1
+            traceback.print_exc()
+        finally:
+            os._exit(code)  # без выхода из кода родителя (finally, atexit)
+
+    def _stop(self, signum, frame):
+        self._stopping = True
+        self._terminate()
+
+    def _terminate(self):
+        for pid in self._children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+class Worker:
+    """Процесс-обработчик. Обслуживает несколько соединений без блокировки: запросы, полученные из соединения одним
+    чтением, обрабатываются пакетом, ответы накапливаются в буфере соединения и отправляются по мере готовности
+    сокета. Пока неотправленных ответов больше WORKER_OUTPUT_LIMIT байт, запросы соединения не читаются"""
+    def __init__(self, corrector: Corrector, listener: socket.socket):
+        self.corrector = corrector
+        self.listener = listener
+        self._buffers: dict[socket.socket, bytearray] = {}  # полученное, еще не разобранное на сообщения
+        self._output: dict[socket.socket, bytearray] = {}  # неотправленные ответы
+
+    def run(self):
+        selector = selectors.DefaultSelector()
+        self.listener.setblocking(False)  # соединение может принять другой процесс
+        selector.register(self.listener, selectors.EVENT_READ)
+        while True:
+            for key, events in selector.select():
+                connection = key.fileobj
+                if connection is self.listener:
+                    try:
+                        connection, _ = self.listener.accept()
+                    except BlockingIOError:
+                        continue
+                    connection.setblocking(False)
+                    self._buffers[connection] = bytearray()
+                    self._output[connection] = bytearray()
+                    selector.register(connection, selectors.EVENT_READ)
+                    continue
+                alive = not events & selectors.EVENT_WRITE or self._send(connection)
+                if alive and events & selectors.EVENT_READ:
+                    alive = self._receive(connection)
+                if not alive:
+                    selector.unregister(connection)
+                    del self._buffers[connection], self._output[connection]
+                    connection.close()
+                    continue
+                output = self._output[connection]
+                wanted = (selectors.EVENT_READ if len(output) <= WORKER_OUTPUT_LIMIT else 0) | \
+                    (selectors.EVENT_WRITE if output else 0)
+                if wanted != key.events:
+                    selector.modify(connection, wanted)
+
+    def _receive(self, connection: socket.socket) -> bool:
+        """False — соединение закрыто клиентом или с ошибкой"""
+        try:
+            data = connection.recv(RECV_SIZE)
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        if not data:
+            return False
+        buffer = self._buffers[connection]
+        buffer += data
+        requests = decode(buffer)
+        output = self._output[connection]
+        for i in range(0, len(requests), SERVE_BATCH_LIMIT):
+            output += b''.join(self._execute(requests[i:i + SERVE_BATCH_LIMIT]))
+        return self._send(connection) if requests else True
+
+    def _send(self, connection: socket.socket) -> bool:
+        """Отправка накопленных ответов, сколько примет сокет. False — соединение закрыто или с ошибкой"""
+        output = self._output[connection]
+        try:
+            while output:
+                sent = connection.send(output)
+                del output[:sent]
+        except BlockingIOError:
+            pass
+        except OSError:
+            return False
+        return True
+
+    def _execute(self, requests: list[bytes]) -> Iterator[bytes]:
+        try:
+            lines = [request.decode('utf-8') for request in requests]
+            results = self.corrector.execute_batch(lines)
+        except Exception as e:
+            if len(requests) > 1:  # ошибка относится к одной из строк, остальные обрабатываются
+                for request in requests:
+                    yield from self._execute([request])
+                return
+            yield encode(bytes((ERROR,)) + f'{type(e).__name__}: {e}'.encode('utf-8'))
+            return
+        for result in results:
+            yield encode(bytes((OK,)) + result.encode('utf-8'))
+
+
+# ========== Клиент ===================================================================
+class ServerError(Exception):
+    """Ошибка обработки строки сервером"""
+
+
+class CorrectorClient:
+    """Клиент сервера. Соединение не рассчитано на одновременное использование из нескольких потоков"""
+    def __init__(self, address: TAddress, timeout: float | None=None):
+        self.timeout = timeout
+        self._socket = _socket(address)
+        self._socket.settimeout(timeout)
+        self._socket.connect(str(address) if isinstance(address, (str, Path)) else address)
+        self._buffer = bytearray()
+        self._responses: list[bytes] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._socket.close()
+
+    def execute(self, line: str) -> str:
+        self._send(encode(line.encode('utf-8')))
+        return self._result()
+
+    def execute_many(self, lines: Iterable[str], window: int=CLIENT_WINDOW) -> list[str]:
+        return list(self.execute_iter(lines, window))
+
+    def execute_iter(self, lines: Iterable[str], window: int=CLIENT_WINDOW) -> Iterator[str]:
+        """Результаты в порядке строк. Без ожидания ответов отправляется до window запросов, ответы на которые
+        читаются и во время отправки"""
+        lines = iter(lines)
+        pending = 0
+        while True:
+            requests = [encode(line.encode('utf-8')) for line in islice(lines, window - pending)]
+            if requests:
+                self._send(b''.join(requests))
+                pending += len(requests)
+            if not pending:
+                return
+            yield self._result()
+            pending -= 1
+
+    def _send(self, data: bytes):
+        """Отправка с одновременным чтением ответов: сервер, ответы которого не читаются, перестает читать запросы
+        (см. WORKER_OUTPUT_LIMIT), и отправка большого объема без чтения блокировала бы обе стороны"""
+        view = memoryview(data)
+        self._socket.setblocking(False)
+        try:
+            with selectors.DefaultSelector() as selector:
+                selector.register(self._socket, selectors.EVENT_READ | selectors.EVENT_WRITE)
+                while view:
+                    events = selector.select(self.timeout)
+                    if not events:
+                        raise TimeoutError('Превышено время ожидания сервера')
+                    _, mask = events[0]
+                    if mask & selectors.EVENT_READ:
+                        self._read()
+                    if mask & selectors.EVENT_WRITE:
+                        try:
+                            view = view[self._socket.send(view):]
+                        except BlockingIOError:
+                            pass
+        finally:
+            self._socket.settimeout(self.timeout)
+
+    def _read(self):
+        try:
+            data = self._socket.recv(RECV_SIZE)
+        except BlockingIOError:
+            return
+        if not data:
+            raise ConnectionError('Сервер закрыл соединение')
+        self._buffer += data
+        self._responses[:0] = decode(self._buffer)[::-1]  # очередь ответов — в обратном порядке
+
+    def _result(self) -> str:
+        while not self._responses:
+            self._read()
+        response = self._responses.pop()
+        text = response[1:].decode('utf-8')
+        if response[0] != OK:
+            raise ServerError(text)
+        return text
+
+
+def main(argv: list[str]=None):
+    parser = argparse.ArgumentParser(prog='python -m dicrector.serve', description=__doc__.split('\n')[0])
+    parser.add_argument('--dicts', nargs='+', required=True, help='словари в порядке применения')
+    address = parser.add_mutually_exclusive_group(required=True)
+    address.add_argument('--socket', type=Path, help='путь сокета Unix')
+    address.add_argument('--tcp', type=tcp_address, help='хост:порт')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='процессов-обработчиков')
+    parser.add_argument('--word-cache', type=int, default=0, help='размер кеша слов каждого процесса')
+    parser.add_argument('--load-workers', type=int, default=1, help='процессов загрузки словарей')
+    parser.add_argument('--shared', action='store_true',
+                        help='словари dic в общей памяти, без копирования страниц в процессы (см. dicrector.shared)')
+    args = parser.parse_args(argv)
+    corrector = Corrector(args.dicts, word_cache=args.word_cache, load_workers=args.load_workers)
+    shared = corrector.share() if args.shared else None
+    print(f'dicrector: словарей {len(args.dicts)}, обработчиков {args.workers}, {args.socket or args.tcp}',
+          file=sys.stderr)
+    try:
+        Server(corrector, args.socket or args.tcp, args.workers).serve_forever()
+    finally:
+        if shared is not None:
+            shared.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+"""Словари dic в общей памяти процессов.
+
+Каждый процесс пула (execute_many, AsyncCorrector с workers > 1, процессы gunicorn) держит собственную копию
+словарей: объекты правил, шаблонов и словари индекса. Расход памяти растет с числом процессов. Словарь DictionaryIndex
+можно записать в файл плоской структуры — строки шаблонов и замен, хеш-таблицы ключей, массивы номеров правил —
+и отобразить его в память процессов (mmap) только для чтения. Страницы файла общие для всех процессов: в отличие
+от копирования при fork, обращение к ним не изменяет счетчиков ссылок и не копирует страницы.
+
+    shared = corrector.share()  # в родительском процессе, файлы в /dev/shm
+    corrector.execute_many(lines, workers=8)  # процессы пула подключают файлы вместо загрузки словарей
+    shared.close()
+
+    Corrector(names, shared=segments)  # в процессе gunicorn, segments — SharedDictionaries.segments родителя
+
+Файл подключается по пути. Поиск по словарю из файла медленнее, чем по dict процесса (хеш ключа crc32 вычисляется
+в Python), а правило создается при обращении к нему. Процесс хранит последние RULE_CACHE_SIZE правил и кандидатов
+CANDIDATES_CACHE_SIZE слов."""
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import zlib
+from array import array
+from collections.abc import Sequence
+from functools import lru_cache
+from itertools import chain
+from pathlib import Path
+from typing import Callable, Iterable
+
+from .components import Dictionary, DictionaryIndex, PatternWildcard, Rule, CachePolicy, Depends
+from .indexer import Indexer, Wildcard
+
+MAGIC = b'DICRSHM1'
+HEADER = struct.Struct('<Q')
+ALIGN = 8
+RULE_CACHE_SIZE = 16384  # правил, хранимых процессом после обращения к ним
+CANDIDATES_CACHE_SIZE = 16384  # слов, для которых процесс хранит номера правил-кандидатов
+SHARED_DIR = '/dev/shm'  # при отсутствии — временная папка системы
+
+WILDCARDS = list(Wildcard)
+CASE_SENSITIVE, FOLD_YO = 1, 8  # флаги правила, биты 1-2 — номер маски в WILDCARDS
+
+
+def _encode(text: str) -> bytes:
+    return text.encode('utf-8', 'surrogatepass')
+
+
+def _decode(data: memoryview) -> str:
+    return str(data, 'utf-8', 'surrogatepass')
+
+
+# ========== Запись ===================================================================
+class _Layout:
+    """Секции файла: массивы и строки байт, выровненные по ALIGN. Описание секций (meta) — pickle в начале файла"""
+    def __init__(self):
+        self.sections: list[bytes] = []
+        self.size = 0
+        self.meta = {}
+
+    def add(self, name: str, data: bytes | array):
+        typecode = None
+        if isinstance(data, array):
+            typecode, data = data.typecode, data.tobytes()
+        self.meta[name] = self.size, len(data), typecode
+        padding = -len(data) % ALIGN
+        self.sections.append(data + bytes(padding))
+        self.size += len(data) + padding
+
+    def add_strings(self, name: str, items: Iterable[bytes]):
+        offsets = array('I', [0])
+        blob = bytearray()
+        for item in items:
+            blob += item
+            offsets.append(len(blob))
+        self.add(name + '.offsets', offsets)
+        self.add(name, bytes(blob))
+
+    def add_map(self, name: str, items: dict[str, int | tuple[int, ...]], merge: Callable):
+        """Хеш-таблица с открытой адресацией. Ячейка — хеш ключа (crc32) в старших 32 битах и номер значения + 1
+        в младших, 0 — пустая. Сами ключи не хранятся: значения ключей с одинаковым хешем объединяются merge"""
+        values = {}
+        for key, value in items.items():
+            hash_ = zlib.crc32(_encode(key))
+            values[hash_] = value if hash_ not in values else merge(values[hash_], value)
+        mask = (1 << max(3, (4 * len(values)).bit_length())) - 1  # заполнено не больше четверти ячеек
+        table = array('Q', bytes(8 * (mask + 1)))
+        for i, hash_ in enumerate(values):
+            slot = hash_ & mask
+            while table[slot]:
+                slot = (slot + 1) & mask
+            table[slot] = hash_ << 32 | i + 1
+        self.add(name + '.table', table)
+        value_offsets = array('I', [0])
+        flat = array('I')
+        for value in values.values():
+            flat.extend(value if isinstance(value, tuple) else (value,))
+            value_offsets.append(len(flat))
+        self.add(name + '.value_offsets', value_offsets)
+        self.add(name + '.values', flat)
+
+    def write(self, path: Path):
+        meta = pickle.dumps(self.meta, protocol=pickle.HIGHEST_PROTOCOL)
+        start = len(MAGIC) + HEADER.size + len(meta)
+        start += -start % ALIGN
+        temp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        try:
+            with temp.open('wb') as handle:
+                handle.write(MAGIC)
+                handle.write(HEADER.pack(len(meta)))
+                handle.write(meta)
+                handle.write(bytes(start - handle.tell()))
+                for section in self.sections:
+                    handle.write(section)
+        except OSError:
+            temp.unlink(missing_ok=True)
+            raise
+        os.replace(temp, path)
+
+
+def shareable(dictionary) -> bool:
+    """Словарь dic (или уже подключенный из общей памяти): правила — шаблоны PatternWildcard с заменой-строкой,
+    индекс — Indexer. Словари с функциями замены, AutomatonIndexer и словари других форматов не записываются"""
+    if isinstance(dictionary, SharedDictionaryIndex):
+        return True
+    return (type(dictionary) is DictionaryIndex
+            and (dictionary._index is None or type(dictionary._index) is Indexer)
+            and all(type(rule) is Rule and type(rule.pattern) is PatternWildcard and type(rule.target) is str
+                    for rule in dictionary.rules))
+
+
+def share(dictionary: DictionaryIndex, path: Path):
+    """Запись словаря в файл path (см. shareable)"""
+    layout = _Layout()
+    rules = dictionary.rules
+    layout.add_strings('patterns', (_encode(rule.pattern._pattern) for rule in rules))
+    layout.add_strings('targets', (_encode(rule.target) for rule in rules))
+    layout.add('flags', array('B', (rule.pattern.case_sensitive * CASE_SENSITIVE
+                                    | WILDCARDS.index(rule.pattern.wildcard) << 1
+                                    | rule.pattern.fold_yo * FOLD_YO for rule in rules)))
+    layout.add_map('exact', dictionary._exact, _merged_rules)
+    index = dictionary._index
+    if index is not None:
+        offsets, postings = array('I', index._offsets), array('I', index._postings)
+
+        def merged_slot(*slots: int) -> int:  # новая ячейка Indexer с правилами обеих
+            postings.extend(sorted(chain.from_iterable(postings[offsets[slot]:offsets[slot + 1]] for slot in slots)))
+            offsets.append(len(postings))
+            return len(offsets) - 2
+
+        for wildcard, slots in index._index.items():
+            layout.add_map(f'index.{wildcard.name}', slots, merged_slot)
+        layout.add('index.offsets', offsets)
+        layout.add('index.postings', postings)
+        layout.meta['index'] = index._key_length, index._index_minsize, index._filter
+    layout.meta['dictionary'] = dictionary.path, dictionary.fold_yo
+    layout.write(path)
+
+
+def _merged_rules(*values: int | tuple[int, ...]) -> tuple[int, ...]:
+    return tuple(sorted(chain.from_iterable(value if isinstance(value, tuple) else (value,) for value in values)))
+
+
+# ========== Чтение ===================================================================
+class _Segment:
+    """Файл, отображенный в память только для чтения"""
+    def __init__(self, path: Path):
+        with open(path, 'rb') as handle:
+            self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._mmap)
+        if buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} — не файл словаря в общей памяти')
+        meta_size, = HEADER.unpack_from(buffer, len(MAGIC))
+        start = len(MAGIC) + HEADER.size
+        self.meta = pickle.loads(buffer[start:start + meta_size])
+        start += meta_size
+        self._data = buffer[start + -start % ALIGN:]
+
+    def __getitem__(self, name: str) -> memoryview:
+        offset, size, typecode = self.meta[name]
+        section = self._data[offset:offset + size]
+        return section.cast(typecode) if typecode and typecode != 'B' else section
+
+    def map(self, name: str, multiple: bool) -> 'SharedMap':
+        return SharedMap(self[name + '.table'], self[name + '.value_offsets'] if multiple else None,
+                         self[name + '.values'])
+
+
+class SharedMap:
+    """Словарь только для чтения (метод get), ключ — строка, значение — номер или, при multiple, кортеж номеров,
+    если их несколько. Хеш — crc32 ключа в UTF-8: хеш строк Python зависит от процесса. Ключи не сравниваются,
+    поэтому отсутствующий ключ с хешем одного из ключей таблицы или ключ, хеш которого совпал с хешем другого
+    ключа, получает и чужие номера правил. Лишних кандидатов отбрасывает проверка шаблона, как и кандидатов индекса
+    по срезу ключа"""
+    __slots__ = ('_table', '_mask', '_value_offsets', '_values')
+
+    def __init__(self, table: memoryview, value_offsets: memoryview | None, values: memoryview):
+        self._table, self._mask = table, len(table) - 1
+        self._value_offsets, self._values = value_offsets, values
+
+    def get(self, key: str, default=None):
+        hash_ = zlib.crc32(key.encode('utf-8', 'surrogatepass'))
+        table, mask = self._table, self._mask
+        slot = hash_ & mask
+        while entry := table[slot]:
+            if entry >> 32 == hash_:
+                item = (entry & 0xFFFFFFFF) - 1
+                if self._value_offsets is None:
+                    return self._values[item]
+                start, stop = self._value_offsets[item], self._value_offsets[item + 1]
+                return self._values[start] if stop - start == 1 else tuple(self._values[start:stop])
+            slot = (slot + 1) & mask
+        return default
+
+
+class SharedRules(Sequence):
+    """Правила словаря из файла. Правило создается при обращении к нему"""
+    def __init__(self, segment: _Segment):
+        self._pattern_offsets, self._patterns = segment['patterns.offsets'], segment['patterns']
+        self._target_offsets, self._targets = segment['targets.offsets'], segment['targets']
+        self._flags = segment['flags']
+        self._rule = lru_cache(RULE_CACHE_SIZE)(self._make)
+
+    def __len__(self):
+        return len(self._flags)
+
+    def __getitem__(self, i):
+        try:
+            return self._rule(i)
+        except TypeError:  # срез не хешируется
+            return [self._rule(j) for j in range(*i.indices(len(self)))]
+
+    def _make(self, i: int) -> Rule:
+        if i < 0:
+            i += len(self)
+        flags = self._flags[i]  # IndexError за пределами словаря
+        pattern = _decode(self._patterns[self._pattern_offsets[i]:self._pattern_offsets[i + 1]])
+        target = _decode(self._targets[self._target_offsets[i]:self._target_offsets[i + 1]])
+        return Rule(PatternWildcard(pattern, bool(flags & CASE_SENSITIVE), WILDCARDS[flags >> 1 & 3],
+                                    bool(flags & FOLD_YO)), target)
+
+
+class SharedDictionaryIndex(DictionaryIndex):
+    """DictionaryIndex, правила и индекс которого читаются из файла в общей памяти (см. share). В WordChain
+    с другими словарями общим индексом не объединяется: MergedIndex создал бы все правила в каждом процессе.
+    Перезагрузка создает обычный словарь процесса"""
+    def __init__(self, segment_path: Path):
+        segment = _Segment(segment_path)
+        path, fold_yo = segment.meta['dictionary']
+        Dictionary.__init__(self, SharedRules(segment), path)
+        self.segment_path = Path(segment_path)
+        self.fold_yo = fold_yo
+        self._exact = segment.map('exact', multiple=True)
+        self._index = None
+        if 'index' in segment.meta:
+            index = Indexer.__new__(Indexer)
+            index._key_length, index._index_minsize, index._filter = segment.meta['index']
+            index._index = {wildcard: segment.map(f'index.{wildcard.name}', multiple=False) for wildcard in Wildcard}
+            index._offsets, index._postings = segment['index.offsets'], segment['index.postings']
+            self._index = index
+        self._row_hashes = None
+        self._match_normalized = True
+        # поиск по таблицам файла медленнее dict, поэтому кандидаты частых слов хранятся в процессе
+        self._cached_candidates = lru_cache(CANDIDATES_CACHE_SIZE)(self._shared_candidates)
+
+    def _shared_candidates(self, normalized: str) -> tuple[int, ...]:
+        return tuple(DictionaryIndex._candidates(self, normalized))
+
+    def _candidates(self, normalized: str) -> tuple[int, ...]:
+        return self._cached_candidates(normalized)
+
+    def __reduce__(self):
+        return self.__class__, (self.segment_path,)
+
+    def reload(self, depends: Depends) -> Dictionary:
+        return Dictionary.reload(self, depends)
+
+    @property
+    def cache_policy(self) -> CachePolicy:
+        return CachePolicy.pure  # замены — строки
+
+
+def attach(segment_path: str | Path) -> SharedDictionaryIndex:
+    return SharedDictionaryIndex(Path(segment_path))
+
+
+class SharedDictionaries:
+    """Файлы словарей в общей памяти, созданные Corrector.share. segments — номер словаря в цепочке: путь файла,
+    параметр shared Corrector. close удаляет файлы: подключенные процессы продолжают с ними работать, новые
+    подключиться уже не смогут"""
+    def __init__(self, dictionaries: list, directory: str | Path=None):
+        if directory is None:
+            directory = SHARED_DIR if os.path.isdir(SHARED_DIR) else tempfile.gettempdir()
+        self.directory = Path(tempfile.mkdtemp(prefix='dicrector-', dir=directory))
+        self.segments: dict[int, Path] = {}
+        try:
+            for i, dictionary in enumerate(dictionaries):
+                if isinstance(dictionary, SharedDictionaryIndex):
+                    self.segments[i] = dictionary.segment_path
+                elif shareable(dictionary):
+                    path = self.directory / f'{i}.{Path(dictionary.path or "dictionary").name}.shm'
+                    share(dictionary, path)
+                    self.segments[i] = path
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.segments = {}
+        if self.directory.exists():
+            for path in self.directory.iterdir():
+                path.unlink(missing_ok=True)
+            self.directory.rmdir()
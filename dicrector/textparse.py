@@ -1,11 +1,8 @@
 import weakref
-from dataclasses import dataclass
-from functools import cached_property
+from time import perf_counter
 from typing import Iterable
 
-from razdel import sentenize, tokenize
-from razdel.segmenters.tokenize import RULES, RU
-from razdel.rule import FunctionRule, JOIN
+from .tokenizers import ITokenizer, RazdelTokenizer
 
 
 
@@ -18,123 +15,392 @@ from razdel.rule import FunctionRule, JOIN
 # авторских ошибок "понаучному = по научному" или "по-научному" маловероятно.
 
 
-def with_space(tokens: Iterable) -> Iterable[str]:
-    last_stop = None
-    for token in tokens:
-        # noinspection PyProtectedMember
-        text_obj = token._text_obj
-        if last_stop and text_obj.start > last_stop:
-            yield ' ' * (text_obj.start - last_stop)
-        yield token.text
-        last_stop = text_obj.stop
+REPARSE_MARGIN = 2  # дочек, разбираемых заново с каждой стороны измененного участка
+# Не менее стольких символов неизмененного текста разбирается заново с каждой стороны измененного участка: razdel
+# решает о границе предложения по 10 символам с каждой ее стороны, и короткие дочки REPARSE_MARGIN не отделяют
+# изменение от границы участка (например "Слово. — ! « ! а": строчная буква объединяет "Слово." с "— !")
+REPARSE_CONTEXT = 16
 
 
-@dataclass
-class TextObj:  # заглушка, для идентичности обработки. Doc для Sentence и DocToken для Token тоже имеют свойство text
-    text: str
+def yo_folded(text: str) -> str:
+    return text.replace('ё', 'е').replace('Ё', 'Е')
+
+
+class TextStats:
+    """Время разбора текста нод на дочки и обратной сборки текста из дочек. Сборка строки вызывает сборку
+    измененных предложений, вложенные вызовы учитываются в вызове верхнего уровня. Включается присвоением
+    модульной переменной stats, без нее замеры ничего не стоят"""
+    __slots__ = ('parse_seconds', 'parse_calls', 'join_seconds', 'join_calls', '_active')
+
+    def __init__(self):
+        self.parse_seconds = self.join_seconds = 0.0
+        self.parse_calls = self.join_calls = 0
+        self._active = False
+
+    def parse(self, func, *args):
+        if self._active:
+            return func(*args)
+        self._active = True
+        start = perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.parse_seconds += perf_counter() - start
+            self.parse_calls += 1
+            self._active = False
+
+    def join(self, func):
+        if self._active:
+            return func()
+        self._active = True
+        start = perf_counter()
+        try:
+            return func()
+        finally:
+            self.join_seconds += perf_counter() - start
+            self.join_calls += 1
+            self._active = False
+
+
+stats: TextStats | None = None
 
 
 class Node:
     child_class = None  # Определяется в потомках
     _parser = None  # Определяется в потомках
-    def __init__(self, text_obj: TextObj, parent: 'Node' = None):
-        self._text_obj = text_obj
-        self.parent = weakref.proxy(parent) if parent else None
+    # Разбор дает объекты с позициями (start, stop) в тексте ноды. Тогда после изменения текста повторно разбирается
+    # только измененный участок (см. _reparse), остальные дочки сохраняются вместе со своим разбором.
+    _incremental = False
+    # Ноды создаются на каждый токен, поэтому без __dict__: текст и позиция в тексте родителя хранятся в самой ноде,
+    # а ссылка на родителя — один weakref.proxy, общий для всех его дочек (см. _as_parent).
+    __slots__ = ('_text', '_start', '_stop', 'parent', '_proxy', '_childs', '_child_changed', '_parsed_text',
+                 '_edited', '_normalized', '__weakref__')
+
+    def __init__(self, text: str, parent: 'Node' = None, start: int = 0, stop: int = 0):
+        self._text = text
+        self._start = start
+        self._stop = stop
+        self.parent = parent._as_parent() if parent is not None else None
+        self._proxy = None
         self._childs = None
         self._child_changed = False
+        self._parsed_text = None  # текст, которому соответствуют дочки, если после разбора он был изменен
+        self._edited = False  # текст изменен после разбора родителя
+        self._normalized = None  # [текст, он же в нижнем регистре, и с е вместо ё], см. normalized
 
     def __repr__(self):
-        return f'{self.__class__.__name__}, {self._text_obj}'
+        return f'{self.__class__.__name__}, {self._text!r}'
+
+    def _as_parent(self):
+        if self._proxy is None:
+            self._proxy = weakref.proxy(self)
+        return self._proxy
 
     @property
     def text(self) -> str:
         if self._child_changed: 
-            new_text = self._joiner()  # флаг changed автоматически означает, что дочки есть
-            self._text_obj.text = new_text  # уведомлять никого не надо, это было сделано на этапе изменения дочек
+            # уведомлять никого не надо, это было сделано на этапе изменения дочек
+            self._text = self._joiner() if stats is None else stats.join(self._joiner)
             self._child_changed = False  # удалять дочек не надо. Просто актуализируем содержимое ноды
                                          # !!Потенциальная проблема, если меняется количество слов, например в rexw и dicx
-        return self._text_obj.text
+        return self._text
 
     @text.setter
     def text(self, value: str):
         # перед проверкой надо убедиться в актуальности содержимого ноды.
         # Для этого вызываем не поле _text, а свойство text, в котором и проводится актуализация
         if self.text != value:
-            self._text_obj.text = value
-            self._childs = None
-            if self.parent:
+            self._normalized = None
+            if not (self._incremental and self._childs):
+                self._childs = None
+            elif self._parsed_text is None:  # разбор откладывается до обращения к дочкам
+                self._parsed_text = self._text
+            self._text = value
+            self._edited = True
+            if self.parent is not None:
                 self.parent.child_changed()
 
+    def normalized(self, fold_yo: bool=False) -> str:
+        """Текст в нижнем регистре, с fold_yo — еще и с е вместо ё. Вычисляется при первом обращении и хранится,
+        пока текст не изменится, поэтому общий для шаблонов и индексов всех словарей"""
+        text = self.text
+        normalized = self._normalized
+        if normalized is None or normalized[0] is not text:  # текст мог быть собран заново из дочек
+            normalized = self._normalized = [text, text.lower(), None]
+        if not fold_yo:
+            return normalized[1]
+        if normalized[2] is None:
+            normalized[2] = yo_folded(normalized[1])
+        return normalized[2]
+
     @property
     def childs(self) -> list['Node']:
+        if self._parsed_text is not None:
+            if stats is None:
+                self._reparse(self._parsed_text, self.text)
+            else:
+                stats.parse(self._reparse, self._parsed_text, self.text)
+            self._parsed_text = None
         if not self._childs:
-            self._childs = [self.child_class(t, parent=self)
-                            for t in self._parser(self.text)]
+            if stats is None:
+                self._childs = self._make_childs(self._parser(self.text))
+            else:
+                self._childs = stats.parse(lambda text: self._make_childs(self._parser(text)), self.text)
         return self._childs
 
+    def _make_childs(self, substrings: Iterable) -> list['Node']:
+        child_class = self.child_class
+        return [child_class(s.text, self, s.start, s.stop) for s in substrings]
+
     def child_changed(self):
         if not self._child_changed:
             self._child_changed = True
-            if self.parent:
+            self._edited = True
+            if self.parent is not None:
                 self.parent.child_changed()
 
     def _joiner(self) -> str:
-        return ''.join(with_space(self._childs))
+        # Промежутки между дочками (пробельные символы, в том числе '\n') сохраняются как есть. Для _incremental
+        # позиции дочек пересчитываются под новый текст.
+        parsed_text = self._text if self._parsed_text is None else self._parsed_text  # текст, в котором позиции дочек
+        chunks = []
+        position = 0
+        last_stop = None
+        for child in self._childs:
+            if last_stop and child._start > last_stop:
+                chunks.append(parsed_text[last_stop:child._start])
+                position += child._start - last_stop
+            text = child.text
+            chunks.append(text)
+            last_stop = child._stop
+            if self._incremental:
+                child._start = position
+                child._stop = position + len(text)
+            position += len(text)
+        return ''.join(chunks)
+
+    def _reparse(self, old: str, new: str):
+        """Обновление дочек после изменения текста ноды с old на new. Заново разбираются только участки между
+        сохранившимися дочками (см. _anchors), вместе с REPARSE_MARGIN дочками, но не менее REPARSE_CONTEXT
+        символов с каждой стороны. Разбор зависит от соседей, поэтому если крайние дочки участка после разбора
+        не совпали с прежними, участок расширяется. Если не совпали и после расширения, разбор неустойчив
+        (изменение сливается с дочками за краем участка) и разбирается весь текст."""
+        childs = self._childs
+        # опорные точки (номер дочки, начало в old, начало в new), по краям — фиктивные
+        anchors = [(-1, 0, 0)]
+        anchors += ((i, childs[i]._start, start) for i, start in self._anchors(old, new))
+        anchors.append((len(childs), len(old), len(new)))
+        # промежутки между опорными точками k и k + 1, в которых есть изменения. Вызов разбора дорог сам по себе,
+        # поэтому все изменения разбираются одним участком
+        gaps = [k for k in range(len(anchors) - 1) if not self._is_gap_same(anchors[k], anchors[k + 1], old, new)]
+        if not gaps:
+            result = [self._moved(childs[i], start) for i, _, start in anchors[1:-1]]
+        else:
+            end = len(anchors) - 1
+            first = max(gaps[0] + 1 - REPARSE_MARGIN, 0)  # участок от опорной точки first до last включительно
+            last = min(gaps[-1] + REPARSE_MARGIN, end)
+            change_start = self._anchor_stop(anchors[gaps[0]])  # измененный текст в new
+            change_stop = anchors[gaps[-1] + 1][2]
+            while first > 0 and change_start - anchors[first][2] < REPARSE_CONTEXT:
+                first -= 1
+            while last < end and self._anchor_stop(anchors[last]) - change_stop < REPARSE_CONTEXT:
+                last += 1
+            widened = False
+            while True:
+                substrings = self._parse_region(anchors[first], anchors[last], new)
+                first_same = first == 0 or self._is_same(anchors[first], substrings[:1])
+                last_same = last == end or self._is_same(anchors[last], substrings[-1:])
+                if first_same and last_same:
+                    break
+                if widened:  # разбор неустойчив — весь текст
+                    first, last = 0, end
+                    continue
+                widened = True
+                if not first_same:
+                    first = max(first - REPARSE_MARGIN, 0)
+                if not last_same:
+                    last = min(last + REPARSE_MARGIN, end)
+            result = [self._moved(childs[i], start) for i, _, start in anchors[1:first]]
+            result += self._match_region(anchors[first], anchors[last], substrings)
+            result += (self._moved(childs[i], start) for i, _, start in anchors[last + 1:-1])
+        self._childs = result
+        self._reparsed()
+
+    def _anchors(self, old: str, new: str) -> list[tuple[int, int]]:
+        """Неизмененные дочки, найденные в new в прежнем окружении (по символу слева и справа, края текста —
+        '\\0'). Возвращается номер дочки и ее начало в new. Проверяется ожидаемое место, с учетом сдвига
+        предыдущих изменений, при несовпадении поиск продолжается со следующих дочек далее по тексту.
+        Измененные дочки разбираются заново, так как их текст мог перестать быть одним токеном."""
+        childs = self._childs
+        old, new = f'\0{old}\0', f'\0{new}\0'
+        anchors = []
+        shift = low = 0
+        i = 0
+        while i < len(childs):
+            child = childs[i]
+            window = old[child._start:child._stop + 2]  # начало окна в old совпадает с началом дочки без окна
+            start = child._start + shift
+            if child._edited or start < low or new[start:start + len(window)] != window:
+                start = -1
+                for i in range(i, len(childs)):
+                    child = childs[i]
+                    if child._edited:
+                        continue
+                    start = new.find(old[child._start:child._stop + 2], low)
+                    if start >= 0:
+                        break
+                if start < 0:
+                    break
+                shift = start - child._start
+            anchors.append((i, start))
+            low = start + child._stop - child._start
+            i += 1
+        return anchors
+
+    def _anchor_stop(self, anchor: tuple) -> int:
+        """Конец дочки опорной точки в new"""
+        no, _, start = anchor
+        return start + len(self._childs[no]._text) if no >= 0 else start
+
+    def _is_gap_same(self, left: tuple, right: tuple, old: str, new: str) -> bool:
+        """Между соседними опорными точками нет других дочек и текст промежутка не изменился"""
+        left_no, old_start, new_start = left
+        if left_no >= 0:
+            length = len(self._childs[left_no]._text)
+            old_start += length
+            new_start += length
+        right_no, old_stop, new_stop = right
+        return right_no == left_no + 1 and old[old_start:old_stop] == new[new_start:new_stop]
+
+    def _is_same(self, anchor: tuple, substrings: list) -> bool:
+        """Разбор участка дал на месте опорной точки ту же дочку"""
+        no, _, start = anchor
+        return bool(substrings) and (substrings[0].start, substrings[0].text) == (start, self._childs[no]._text)
+
+    def _parse_region(self, first: tuple, last: tuple, new: str) -> list:
+        _, _, start = first
+        last_no, _, stop = last
+        if last_no < len(self._childs):
+            stop += len(self._childs[last_no]._text)
+        substrings = list(self._parser(new[start:stop]))
+        for substring in substrings:
+            substring.start += start
+            substring.stop += start
+        return substrings
+
+    def _match_region(self, first: tuple, last: tuple, substrings: list) -> list['Node']:
+        """Сопоставление прежних дочек участка с результатом его разбора. Дочки сохраняются вместе со своим
+        разбором: совпадающие по тексту с краев участка, а при неизменном количестве — все"""
+        old_childs = self._childs[max(first[0], 0):last[0] + 1]
+        if len(old_childs) != len(substrings):
+            head = 0
+            while (head < len(old_childs) and head < len(substrings)
+                   and old_childs[head]._text == substrings[head].text):
+                head += 1
+            tail = 0
+            while (tail < len(old_childs) - head and tail < len(substrings) - head
+                   and old_childs[-1 - tail]._text == substrings[-1 - tail].text):
+                tail += 1
+            middle = self._make_childs(substrings[head:len(substrings) - tail])
+            old_childs = old_childs[:head] + middle + old_childs[len(old_childs) - tail:]
+        for child, substring in zip(old_childs, substrings):
+            child._replace_substring(substring)
+        return old_childs
+
+    @staticmethod
+    def _moved(child: 'Node', start: int) -> 'Node':
+        child._stop = start + child._stop - child._start
+        child._start = start
+        return child
+
+    def _replace_substring(self, substring):
+        """Сохранение ноды при новом разборе родителя. Ее дочки обновляются по тем же правилам, что и при
+        изменении текста"""
+        if self._text != substring.text or any(child._edited for child in self._childs or ()):
+            if not (self._incremental and self._childs):
+                self._childs = None
+            elif self._parsed_text is None:
+                self._parsed_text = self._text
+        self._text = substring.text
+        self._start = substring.start
+        self._stop = substring.stop
+        self._edited = False
+
+    def _reparsed(self):
+        """Вызывается после частичного обновления дочек"""
+        pass
 
 
 class Part(Node):
-    pass
+    __slots__ = ()
 
 
 class Token(Node):
     child_class = Part
+    __slots__ = ()
 
     @staticmethod
-    def _parser(text: str) -> Iterable[TextObj]:
+    def _parser(text: str) -> list[str]:
         # проверка на наличие токена нужна для обхода исходного текста типа дельта- или -1
-        parts = [TextObj(_) for _ in text.split('-') if _]
+        parts = [_ for _ in text.split('-') if _]
         if len(parts) < 2:
             parts = []
         return parts
 
+    def _make_childs(self, parts: list[str]) -> list[Part]:
+        return [Part(part, self) for part in parts]
+
     def _joiner(self) -> str:
         return '-'.join(_.text for _ in self._childs)
 
-    @cached_property
+    @property
     def is_first_word(self) -> bool:
-        return self == self.parent.first_word
+        return self is self.parent.first_word
+
+
+_NOT_SET = object()
 
 
 class Sentence(Node):
     child_class = Token
-    _parser = tokenize
+    _parser = None  # set_tokenizer
+    _incremental = True
+    __slots__ = ('_first_word',)
+
+    def __init__(self, text: str, parent: Node = None, start: int = 0, stop: int = 0):
+        super().__init__(text, parent, start, stop)
+        self._first_word = _NOT_SET
 
-    @cached_property
+    @property
     def first_word(self) -> Token|None:
-        return next((token for token in self._childs if token.text[0].isalnum()), None)
+        if self._first_word is _NOT_SET:
+            self._first_word = next((token for token in self._childs if token.text[0].isalnum()), None)
+        return self._first_word
+
+    def _reparsed(self):
+        self._first_word = _NOT_SET  # первое слово могло измениться
 
 
 class Line(Node):
     child_class = Sentence
-    _parser = sentenize
+    _parser = None  # set_tokenizer
+    _incremental = True
+    __slots__ = ()
 
     @classmethod
     def from_str(cls, text: str):
-        text_obj = TextObj(text)
-        return cls(text_obj)
+        return cls(text, stop=len(text))
+
 
+tokenizer: ITokenizer = RazdelTokenizer()
 
-def accent(split):
-    """Правило для модуля razdel. Отменяет разбиение по символу ударения для кириллицы"""
-    # Правило обрабатывается, только если в split есть знак препинания (?)
-    # left/right — текстовое значение токена; left_1/right_1 — объект, с позицией и типом
-    # цифра после подчеркивания, означает смещение на Х токенов, соответственно влево и вправо
-    # у объекта есть свойство type и normal (предположительно lower())
 
-    if (split.left_1.type == RU and split.right == '`') or\
-       (split.left  == '`' and split.right_1.type == RU):
-        return JOIN
+def set_tokenizer(tokenizer_: ITokenizer):
+    """Выбор бэкенда разбора на предложения и токены, например tokenizers.RegexTokenizer()"""
+    global tokenizer
+    tokenizer = tokenizer_
+    Line._parser = staticmethod(tokenizer.sentenize)
+    Sentence._parser = staticmethod(tokenizer.tokenize)
 
 
-tokenize_rules = RULES
-tokenize_rules.append(FunctionRule(accent))
+set_tokenizer(tokenizer)
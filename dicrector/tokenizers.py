@@ -0,0 +1,113 @@
+from dataclasses import dataclass
+from typing import Iterable, Protocol
+
+from razdel import sentenize, tokenize
+from razdel.rule import FunctionRule, JOIN
+from razdel.segmenters.punct import DASHES, ENDINGS
+from razdel.segmenters.tokenize import RULES, ATOM, SMILE, RU, LAT, PUNCT, OTHER, INT
+
+
+# Разбор текста на предложения и токены. Бэкенд выбирается функцией textparse.set_tokenizer, по умолчанию razdel.
+
+
+class ISubstring(Protocol):
+    start: int
+    stop: int
+    text: str
+
+
+class ITokenizer(Protocol):
+    def sentenize(self, text: str) -> Iterable[ISubstring]: ...
+    def tokenize(self, text: str) -> Iterable[ISubstring]: ...
+
+
+@dataclass(slots=True)
+class Substring:
+    start: int
+    stop: int
+    text: str
+
+
+def accent(split):
+    """Правило для модуля razdel. Отменяет разбиение по символу ударения для кириллицы"""
+    # Правило обрабатывается, только если в split есть знак препинания (?)
+    # left/right — текстовое значение токена; left_1/right_1 — объект, с позицией и типом
+    # цифра после подчеркивания, означает смещение на Х токенов, соответственно влево и вправо
+    # у объекта есть свойство type и normal (предположительно lower())
+
+    if (split.left_1.type == RU and split.right == '`') or\
+       (split.left  == '`' and split.right_1.type == RU):
+        return JOIN
+
+
+tokenize_rules = RULES
+tokenize_rules.append(FunctionRule(accent))
+
+
+class RazdelTokenizer:
+    """Эталонный разбор библиотекой razdel, с правилом accent"""
+    sentenize = staticmethod(sentenize)
+    tokenize = staticmethod(tokenize)
+
+
+class RegexTokenizer:
+    """Быстрый разбор на токены. Атомы (слово, число, знак) выделяются тем же регулярным выражением, что и в razdel,
+    а правила склейки соседних атомов (tokenize_rules, включая accent) проверяются напрямую, без создания объектов
+    на каждую границу. Результат совпадает с razdel. Изменения tokenize_rules этим бэкендом не учитываются.
+    На предложения текст разбирается razdel, это на порядок дешевле разбиения на токены."""
+    sentenize = staticmethod(sentenize)
+
+    def tokenize(self, text: str) -> list[Substring]:
+        atoms = [(match.start(), match.end(), match.lastgroup, match.group()) for match in ATOM.finditer(text)]
+        tokens = []
+        start = stop = None
+        for i, (atom_start, atom_stop, _, _) in enumerate(atoms):
+            if start is None:
+                start = atom_start
+            elif atom_start != stop or not self._join(atoms, i, text[start:stop]):  # атомы через пробел не склеиваются
+                tokens.append(Substring(start, stop, text[start:stop]))
+                start = atom_start
+            stop = atom_stop
+        if start is not None:
+            tokens.append(Substring(start, stop, text[start:stop]))
+        return tokens
+
+    @staticmethod
+    def _join(atoms: list[tuple], i: int, buffer: str) -> bool:
+        """Склейка атома i с предыдущим, buffer — текст токена, накопленного до атома i"""
+        _, _, left_type, left = atoms[i - 1]
+        _, _, right_type, right = atoms[i]
+
+        # правила 2112 (dash, underscore, float, fraction): разделитель слева или справа от границы,
+        # проверяются атомы по обе стороны от него
+        for delimiters, need_int in ((DASHES, False), ('_', False), ('.,', True), ('/\\', True)):
+            if left in delimiters:
+                if i < 2:
+                    continue
+                outer_left, outer_right = atoms[i - 2][2], right_type
+            elif right in delimiters:
+                if i + 1 >= len(atoms):
+                    continue
+                outer_left, outer_right = left_type, atoms[i + 1][2]
+            else:
+                continue
+            if need_int:
+                if outer_left == INT and outer_right == INT:
+                    return True
+            elif outer_left != PUNCT and outer_right != PUNCT:
+                return True
+
+        if left_type == PUNCT and right_type == PUNCT:  # punct
+            if (SMILE.match(buffer + right)
+                    or (left in ENDINGS and right in ENDINGS)
+                    or left + right in ('--', '**')):
+                return True
+
+        if ((left_type == OTHER and right_type in (OTHER, RU, LAT))  # other
+                or (left_type in (OTHER, RU, LAT) and right_type == OTHER)):
+            return True
+
+        if left.lower() == 'yahoo' and right == '!':  # yahoo
+            return True
+
+        return (left_type == RU and right == '`') or (left == '`' and right_type == RU)  # accent
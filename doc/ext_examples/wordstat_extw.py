@@ -1,11 +1,14 @@
 import sqlite3
 from collections import Counter
 
+from dicrector.components import CachePolicy
 from utils.service import is_need_check
 
 
 
 class WordStat:
+    cache_policy = CachePolicy.none  # учитывается каждое вхождение слова
+
     def __init__(self):
         self.stat = Counter()
 